@@ -31,6 +31,7 @@ class Config(BaseSettings):
     max_concurrent_requests: int = Field(2, env='MAX_CONCURRENT_REQUESTS')  # Уменьшено для стабильности
     optimal_chunk_size: int = Field(80000, env='OPTIMAL_CHUNK_SIZE')  # ~20K токенов для batch
     use_async: bool = Field(True, env='USE_ASYNC')  # Использовать асинхронные запросы
+    compress_requests: bool = Field(False, env='COMPRESS_REQUESTS')  # gzip для тел запросов (Content-Encoding)
     
     # Настройки вывода
     save_xml: bool = Field(False, env='SAVE_XML')
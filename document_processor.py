@@ -3,21 +3,26 @@
 """
 
 import os
+import io
 import re
+import sys
 import traceback
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Sequence
 from dataclasses import dataclass
 from pathlib import Path
 import time
 import asyncio
+from array import array
+from bisect import bisect_left
 
+from lxml import etree
 from docx import Document
 from docx.shared import Inches
 from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
+from docx.oxml.ns import qn, nsmap
 from docx.text.paragraph import Paragraph
 from docx.text.run import Run
 from docx.table import Table
@@ -25,29 +30,20 @@ from docx.table import Table
 from improved_image_processor import ImprovedImageProcessor, ImageElement, ImageInfo
 from image_adapter import ImageAdapter
 from formatting_processor import FormattingProcessor
-from translator import DocumentTranslator, TranslationResult
+from translator import TranslationResult, get_translator
 
 
-class TranslationProgress:
-    """Класс для отслеживания прогресса перевода"""
-    
-    def __init__(self, total_items):
-        self.total_items = total_items
-        self.start_time = time.time()
-        
-    def __enter__(self):
-        return self
-        
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
-        
-    def update(self, current_item, total_items, show_details=False):
-        """Обновляет и отображает прогресс"""
-        elapsed = time.time() - self.start_time
-        percentage = (current_item / total_items) * 100 if total_items > 0 else 0
-        
-        if show_details:
-            print(f"    Прогресс: {current_item}/{total_items} ({percentage:.1f}%) - {elapsed:.1f}с")
+# Предкомпилированный XPath: есть ли w:drawing внутри run'ов параграфа (вычисляется в C, до первого совпадения)
+_XP_HAS_RUN_DRAWING = etree.XPath('boolean(./w:r//w:drawing)', namespaces={'w': nsmap['w']})
+
+# Проверка наличия непробельного текста без построения strip()-копии строки
+_has_non_whitespace = re.compile(r'\S').search
+
+# Сколько готовых переводов может ждать сборки документа (ограничивает память конвейера)
+_TRANSLATION_QUEUE_SIZE = 64
+
+# Сколько строк прогресса печатать за весь перевод (ошибки печатаются всегда)
+_PROGRESS_REPORTS = 200
 
 
 @dataclass
@@ -72,7 +68,7 @@ class DocumentProcessor:
         self.images: List[ImageElement] = []
         self.file_path = None
         self.formatting_processor = FormattingProcessor()
-        self.translator = DocumentTranslator()
+        self.translator = get_translator()
         
         # СИСТЕМА ОТСЛЕЖИВАНИЯ ПОЗИЦИЙ
         self.position_tracker = {
@@ -95,78 +91,39 @@ class DocumentProcessor:
             True если загрузка успешна, False иначе
         """
         try:
-            self.document = Document(file_path)
-            self.file_path = file_path
-            self.elements = []
-            return True
+            # Читаем архив целиком одним вызовом: python-docx затем распаковывает
+            # части из памяти, а не делает seek/read по файлу на каждую часть
+            with open(file_path, 'rb') as f:
+                docx_bytes = f.read()
         except Exception as e:
             print(f"Ошибка загрузки документа: {e}")
             return False
+        
+        return self.load_document_from_buffer(docx_bytes, file_path)
     
-    def process_and_translate(self) -> Optional[Document]:
-        """
-        ФИНАЛЬНАЯ ВЕРСИЯ: Главный метод, который выполняет поэлементную реконструкцию
-        документа с переводом, сохраняя всю структуру.
+    def load_document_from_buffer(self, docx_bytes: bytes, file_path: Optional[str] = None) -> bool:
         """
-        if not self.document:
-            print("❌ Документ не загружен.")
-            return None
-
-        # 1. Извлекаем информацию об изображениях и их позициях
-        print("🔍 Шаг 1: Извлечение информации об изображениях...")
-        image_infos = self.improved_image_processor.extract_images_from_docx(self.file_path)
-        self.images = ImageAdapter.convert_list_to_image_elements(image_infos)
-        
-        images_by_paragraph = {}
-        for img in self.images:
-            if img.paragraph_index is not None:
-                if img.paragraph_index not in images_by_paragraph:
-                    images_by_paragraph[img.paragraph_index] = []
-                images_by_paragraph[img.paragraph_index].append(img)
-        
-        print(f"✅ Найдено {len(self.images)} изображений, распределено по {len(images_by_paragraph)} параграфам.")
-
-        # 2. Создаем новый, пустой документ для результата
-        new_doc = Document()
-        
-        # 3. Итерируемся по КАЖДОМУ параграфу оригинального документа
-        print("\n🔍 Шаг 2: Поэлементная реконструкция и перевод документа...")
-        total_paragraphs = len(self.document.paragraphs)
+        Загружает документ из байтов .docx архива
         
-        with TranslationProgress(total_paragraphs) as progress:
-            for i, p in enumerate(self.document.paragraphs):
-                
-                # A. Вставляем изображения, которые идут ПЕРЕД этим параграфом
-                if i in images_by_paragraph:
-                    for image_element in sorted(images_by_paragraph[i], key=lambda img: img.image_id):
-                        self._insert_image_with_smart_positioning(new_doc, image_element, i)
-                        print(f"🖼️  Изображение {image_element.image_id} вставлено перед параграфом {i}")
-
-                # B. Обрабатываем сам параграф
-                if p.text.strip():
-                    # Если есть текст - переводим
-                    print(f"  Переводим параграф {i+1}/{total_paragraphs}...")
-                    result = self.translator.api_translator.translate_text(p.text)
-                    if result.success:
-                        para_formatting = self._extract_paragraph_formatting(p)
-                        new_para = new_doc.add_paragraph()
-                        self._apply_advanced_formatting(new_para, p.text, result.translated_text, para_formatting)
-                    else:
-                        new_doc.add_paragraph(f"[ОШИБКА ПЕРЕВОДА] {p.text}")
-                else:
-                    # Если параграф пустой - просто добавляем пустой параграф для сохранения верстки
-                    new_doc.add_paragraph()
-                
-                progress.update(i + 1, total_paragraphs, True)
-        
-        # TODO: Добавить такую же поэлементную обработку для таблиц, если требуется.
-
-        print("\n✅ Реконструкция документа завершена.")
-        return new_doc
+        Args:
+            docx_bytes: Содержимое .docx файла
+            file_path: Путь к исходному файлу (нужен для извлечения изображений)
+            
+        Returns:
+            True если загрузка успешна, False иначе
+        """
+        try:
+            self.document = Document(io.BytesIO(docx_bytes))
+            self.file_path = file_path
+            self.elements = []
+            return True
+        except Exception as e:
+            print(f"Ошибка загрузки документа: {e}")
+            return False
     
     async def process_and_translate_async(self) -> Optional[Document]:
         """
-        АСИНХРОННАЯ версия метода: поэлементная реконструкция документа с переводом
+        Главный метод: поэлементная реконструкция документа с асинхронным переводом
         """
         if not self.document:
             print("❌ Документ не загружен.")
@@ -192,23 +149,56 @@ class DocumentProcessor:
         paragraph_indices = []
         
         for i, p in enumerate(self.document.paragraphs):
-            if p.text.strip():
+            if _has_non_whitespace(p.text):
                 texts_to_translate.append(p.text)
                 paragraph_indices.append(i)
         
         print(f"✅ Собрано {len(texts_to_translate)} текстов для перевода")
 
-        # 3. Параллельный перевод всех текстов
+        # 3. Параллельный перевод всех текстов. Переводы поступают в очередь по мере готовности,
+        # а документ собирается параллельно с сетевыми запросами
         print("\n🚀 Шаг 3: Параллельный перевод текстов...")
         
+        progress_step = max(1, len(texts_to_translate) // _PROGRESS_REPORTS)
+        
         def progress_callback(completed, total, success):
+            if success and completed % progress_step and completed != total:
+                return
             percentage = (completed / total) * 100 if total > 0 else 0
             status = "✅" if success else "❌"
             print(f"  {status} Переведено: {completed}/{total} ({percentage:.1f}%)")
         
-        translation_results = await self.translator.api_translator.translate_texts_in_parallel(
-            texts_to_translate, progress_callback
-        )
+        results_queue: asyncio.Queue = asyncio.Queue(maxsize=_TRANSLATION_QUEUE_SIZE)
+        
+        async def produce_translations():
+            try:
+                await self.translator.api_translator.translate_texts_streaming(
+                    texts_to_translate, results_queue, progress_callback
+                )
+            except asyncio.CancelledError:
+                # Отменяет только прервавшаяся сборка документа: признак конца ей не нужен,
+                # а put() в заполненную очередь без потребителя ждал бы вечно
+                raise
+            except BaseException:
+                await results_queue.put(None)
+                raise
+            # None - признак того, что новых переводов не будет
+            await results_queue.put(None)
+        
+        producer = asyncio.ensure_future(produce_translations())
+        # Переводы, пришедшие раньше своей очереди в документе
+        pending_results: Dict[int, TranslationResult] = {}
+        translations_finished = False
+        
+        async def next_translation(index: int) -> Optional[TranslationResult]:
+            nonlocal translations_finished
+            while index not in pending_results and not translations_finished:
+                item = await results_queue.get()
+                if item is None:
+                    translations_finished = True
+                else:
+                    pending_results[item[0]] = item[1]
+            return pending_results.pop(index, None)
         
         # 4. Создаем новый документ и восстанавливаем структуру
         print("\n🔄 Шаг 4: Восстановление структуры документа...")
@@ -217,32 +207,41 @@ class DocumentProcessor:
         
         total_paragraphs = len(self.document.paragraphs)
         
-        for i, p in enumerate(self.document.paragraphs):
-            
-            # A. Вставляем изображения, которые идут ПЕРЕД этим параграфом
-            if i in images_by_paragraph:
-                for image_element in sorted(images_by_paragraph[i], key=lambda img: img.image_id):
-                    self._insert_image_with_smart_positioning(new_doc, image_element, i)
-                    print(f"🖼️  Изображение {image_element.image_id} вставлено перед параграфом {i}")
-
-            # B. Обрабатываем сам параграф
-            if p.text.strip():
-                # Используем переведенный текст
-                if translation_index < len(translation_results):
-                    result = translation_results[translation_index]
+        try:
+            for i, p in enumerate(self.document.paragraphs):
+                
+                # A. Вставляем изображения, которые идут ПЕРЕД этим параграфом
+                if i in images_by_paragraph:
+                    for image_element in sorted(images_by_paragraph[i], key=lambda img: img.image_id):
+                        self._insert_image_with_smart_positioning(new_doc, image_element, i)
+                        print(f"🖼️  Изображение {image_element.image_id} вставлено перед параграфом {i}")
+                
+                # B. Обрабатываем сам параграф
+                if _has_non_whitespace(p.text):
+                    # Используем переведенный текст
+                    result = await next_translation(translation_index)
                     translation_index += 1
                     
-                    if result.success:
+                    if result is None:
+                        new_doc.add_paragraph(f"[ОШИБКА ИНДЕКСА] {p.text}")
+                    elif result.success:
                         para_formatting = self._extract_paragraph_formatting(p)
                         new_para = new_doc.add_paragraph()
                         self._apply_advanced_formatting(new_para, p.text, result.translated_text, para_formatting)
                     else:
                         new_doc.add_paragraph(f"[ОШИБКА ПЕРЕВОДА] {p.text}")
                 else:
-                    new_doc.add_paragraph(f"[ОШИБКА ИНДЕКСА] {p.text}")
-            else:
-                # Если параграф пустой - просто добавляем пустой параграф для сохранения верстки
-                new_doc.add_paragraph()
+                    # Если параграф пустой - просто добавляем пустой параграф для сохранения верстки
+                    new_doc.add_paragraph()
+        except BaseException:
+            # Документ не собран - оставшиеся переводы уже не нужны
+            producer.cancel()
+            raise
+        
+        # Пробрасываем ошибку переводчика, если она была
+        await producer
+        
+        # TODO: Добавить такую же поэлементную обработку для таблиц, если требуется.
 
         print("\n✅ Асинхронная реконструкция документа завершена.")
         return new_doc
@@ -260,22 +259,20 @@ class DocumentProcessor:
         if not images or not self.document:
             return images
             
-        total_paragraphs = len(self.document.paragraphs)
+        # document.paragraphs каждый раз заново строит список из XML - получаем его один раз
+        paragraphs = self.document.paragraphs
+        total_paragraphs = len(paragraphs)
         print(f"🔍 ВАЛИДАЦИЯ: Проверяем {len(images)} изображений против {total_paragraphs} параграфов")
         
-        # Создаем карту значимых параграфов для лучшего сопоставления
-        significant_paragraphs = []
-        for i, para in enumerate(self.document.paragraphs):
-            has_text = para.text.strip()
-            has_images = any(run._element.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}drawing') for run in para.runs)
-            
-            if has_text or has_images:
-                significant_paragraphs.append({
-                    'index': i,
-                    'text_preview': para.text[:50] + '...' if len(para.text) > 50 else para.text,
-                    'has_text': has_text,
-                    'has_images': has_images
-                })
+        # Создаем карту значимых параграфов для лучшего сопоставления.
+        # significant_paragraphs - отсортированные индексы значимых параграфов,
+        # paragraph_rank[i] - номер параграфа i среди значимых или -1 (4 байта на параграф)
+        significant_paragraphs = array('i')
+        paragraph_rank = array('i', [-1]) * total_paragraphs
+        for i, para in enumerate(paragraphs):
+            if _has_non_whitespace(para.text) or self._paragraph_has_drawing(para):
+                paragraph_rank[i] = len(significant_paragraphs)
+                significant_paragraphs.append(i)
         
         print(f"🔍 ВАЛИДАЦИЯ: Найдено {len(significant_paragraphs)} значимых параграфов")
         
@@ -307,11 +304,7 @@ class DocumentProcessor:
                 stats['invalid_positions'] += 1
             else:
                 # Проверяем, является ли позиция значимой
-                target_para = self.document.paragraphs[image.paragraph_index]
-                has_meaningful_content = (target_para.text.strip() or 
-                                        any(run._element.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}drawing') for run in target_para.runs))
-                
-                if has_meaningful_content:
+                if paragraph_rank[image.paragraph_index] >= 0:
                     print(f"✅ ВАЛИДАЦИЯ: Изображение {image.image_id} имеет валидную позицию {image.paragraph_index}")
                     stats['valid_positions'] += 1
                 else:
@@ -372,6 +365,11 @@ class DocumentProcessor:
         
         return corrected_images
     
+    @staticmethod
+    def _paragraph_has_drawing(paragraph: Paragraph) -> bool:
+        """Проверяет, есть ли в run'ах параграфа изображение (w:drawing)"""
+        return _XP_HAS_RUN_DRAWING(paragraph._p)
+    
     def _perform_hybrid_validation(self):
         """
         ГИБРИДНАЯ ВАЛИДАЦИЯ: Дополнительная диагностика позиций изображений
@@ -385,26 +383,14 @@ class DocumentProcessor:
         print(f"\n🔍 ГИБРИДНАЯ ВАЛИДАЦИЯ: Проверяем корректность позиций")
         print(f"📊 Python-docx видит: {total_paragraphs} параграфов")
         
-        # Проверяем количество параграфов с XML стороны
+        # Проверяем количество параграфов с XML стороны.
+        # Процессор изображений уже посчитал их при потоковом разборе document.xml -
+        # повторно распаковывать и разбирать документ не нужно
         xml_paragraphs_count = None
         if hasattr(self.improved_image_processor, '_last_positions'):
-            # Попытка получить количество XML параграфов из логов процессора
-            try:
-                import zipfile
-                import xml.etree.ElementTree as ET
-                
-                with zipfile.ZipFile(self.file_path, 'r') as docx_zip:
-                    doc_content = docx_zip.read('word/document.xml')
-                    root = ET.fromstring(doc_content)
-                    body = root.find('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}body')
-                    
-                    if body is not None:
-                        xml_paragraphs = body.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p')
-                        xml_paragraphs_count = len(xml_paragraphs)
-                        print(f"📊 XML-парсер видит: {xml_paragraphs_count} параграфов")
-                        
-            except Exception as e:
-                print(f"⚠️  Не удалось получить количество XML параграфов: {e}")
+            xml_paragraphs_count = self.improved_image_processor._last_paragraphs_count
+            if xml_paragraphs_count is not None:
+                print(f"📊 XML-парсер видит: {xml_paragraphs_count} параграфов")
         
         # Валидация 1: Проверка соответствия количества параграфов
         validation_issues = []
@@ -469,24 +455,24 @@ class DocumentProcessor:
         
         print(f"─" * 60)
     
-    def _find_nearest_significant_paragraph(self, target_index: int, significant_paragraphs: List[dict]) -> Optional[int]:
+    def _find_nearest_significant_paragraph(self, target_index: int, significant_paragraphs: Sequence[int]) -> Optional[int]:
         """Находит ближайший значимый параграф к заданному индексу"""
         if not significant_paragraphs:
             return None
             
-        # Ищем ближайший параграф по индексу
-        best_distance = float('inf')
-        best_index = None
-        
-        for para_info in significant_paragraphs:
-            distance = abs(para_info['index'] - target_index)
-            if distance < best_distance:
-                best_distance = distance
-                best_index = para_info['index']
-        
-        return best_index
+        # Индексы отсортированы - ищем соседей бинарным поиском.
+        # При равном расстоянии выбирается предыдущий параграф
+        position = bisect_left(significant_paragraphs, target_index)
+        if position == 0:
+            return significant_paragraphs[0]
+        if position == len(significant_paragraphs):
+            return significant_paragraphs[-1]
+        
+        before = significant_paragraphs[position - 1]
+        after = significant_paragraphs[position]
+        return before if target_index - before <= after - target_index else after
     
-    def _intelligent_position_correction(self, original_position: int, total_paragraphs: int, significant_paragraphs: List[dict]) -> Optional[int]:
+    def _intelligent_position_correction(self, original_position: int, total_paragraphs: int, significant_paragraphs: Sequence[int]) -> Optional[int]:
         """Интеллектуальная коррекция позиции изображения"""
         if not significant_paragraphs:
             return None
@@ -498,19 +484,19 @@ class DocumentProcessor:
                 # Масштабируем к количеству значимых параграфов
                 corrected_index = int((original_position / total_paragraphs) * len(significant_paragraphs))
                 if corrected_index < len(significant_paragraphs):
-                    return significant_paragraphs[corrected_index]['index']
+                    return significant_paragraphs[corrected_index]
         
         # Стратегия 2: Если позиция близка к концу, используем один из последних параграфов
         if original_position >= total_paragraphs * 0.8:
             last_third = significant_paragraphs[-len(significant_paragraphs)//3:] if len(significant_paragraphs) > 3 else significant_paragraphs
             if last_third:
-                return last_third[0]['index']
+                return last_third[0]
         
         # Стратегия 3: Если позиция в начале, используем один из первых параграфов
         if original_position <= total_paragraphs * 0.2:
             first_third = significant_paragraphs[:len(significant_paragraphs)//3] if len(significant_paragraphs) > 3 else significant_paragraphs
             if first_third:
-                return first_third[-1]['index']
+                return first_third[-1]
         
         return None
     
@@ -525,7 +511,7 @@ class DocumentProcessor:
         else:
             return 'end'  # Очень много изображений - в конец
     
-    def _distribute_images_intelligently(self, images: List[ImageElement], significant_paragraphs: List[dict]) -> int:
+    def _distribute_images_intelligently(self, images: List[ImageElement], significant_paragraphs: Sequence[int]) -> int:
         """Интеллектуально распределяет изображения по документу"""
         if not images or not significant_paragraphs:
             return 0
@@ -540,13 +526,13 @@ class DocumentProcessor:
         for i, image in enumerate(images):
             target_position = min((i + 1) * step, len(significant_paragraphs) - 1)
             if target_position < len(significant_paragraphs):
-                image.paragraph_index = significant_paragraphs[target_position]['index']
+                image.paragraph_index = significant_paragraphs[target_position]
                 print(f"🎯 РАСПРЕДЕЛЕНИЕ: Изображение {image.image_id} размещено в позиции {image.paragraph_index}")
                 distributed_count += 1
         
         return distributed_count
     
-    def _cluster_images_strategically(self, images: List[ImageElement], significant_paragraphs: List[dict]) -> int:
+    def _cluster_images_strategically(self, images: List[ImageElement], significant_paragraphs: Sequence[int]) -> int:
         """Группирует изображения в стратегических местах документа"""
         if not images or not significant_paragraphs:
             return 0
@@ -557,14 +543,14 @@ class DocumentProcessor:
         cluster_points = []
         if len(significant_paragraphs) > 10:
             cluster_points = [
-                significant_paragraphs[len(significant_paragraphs)//4]['index'],  # Первая четверть
-                significant_paragraphs[len(significant_paragraphs)//2]['index'],  # Середина
-                significant_paragraphs[3*len(significant_paragraphs)//4]['index']  # Последняя четверть
+                significant_paragraphs[len(significant_paragraphs)//4],  # Первая четверть
+                significant_paragraphs[len(significant_paragraphs)//2],  # Середина
+                significant_paragraphs[3*len(significant_paragraphs)//4]  # Последняя четверть
             ]
         else:
             cluster_points = [
-                significant_paragraphs[0]['index'],  # Начало
-                significant_paragraphs[-1]['index']  # Конец
+                significant_paragraphs[0],  # Начало
+                significant_paragraphs[-1]  # Конец
             ]
         
         # Распределяем изображения по кластерам
@@ -687,7 +673,7 @@ class DocumentProcessor:
         processed_images_count = 0
         
         # Подсчитываем статистику для стратегического распределения
-        total_text_paragraphs = len([p for p in self.document.paragraphs if p.text.strip()])
+        total_text_paragraphs = sum(1 for p in self.document.paragraphs if _has_non_whitespace(p.text))
         
         print(f"📊 СТРАТЕГИЯ РАСПРЕДЕЛЕНИЯ:")
         print(f"  • Параграфов с текстом: {total_text_paragraphs}")
@@ -717,11 +703,11 @@ class DocumentProcessor:
                     print(f"✅ Изображение {image.image_id} добавлено ПЕРЕД параграфом {paragraph_index}")
             
             # ПОТОМ добавляем сам параграф (если есть текст)
-            has_text = paragraph.text.strip()
-            if has_text:
+            paragraph_text = paragraph.text
+            if _has_non_whitespace(paragraph_text):
                 element = DocumentElement(
                     element_type='paragraph',
-                    content=paragraph.text,
+                    content=paragraph_text,
                     original_element=paragraph,
                     index=element_index,
                     style=paragraph.style.name if paragraph.style else None,
@@ -795,14 +781,18 @@ class DocumentProcessor:
         }
         
         for run in paragraph.runs:
+            # Имена шрифтов и цвета интернируем: уникальных значений в документе единицы,
+            # и дальнейшие операции со множествами/словарями сводятся к сравнению указателей
+            font_name = run.font.name
+            font_color = run.font.color.rgb
             run_formatting = {
                 'text': run.text,
                 'bold': run.bold,
                 'italic': run.italic,
                 'underline': run.underline,
-                'font_name': run.font.name,
+                'font_name': sys.intern(font_name) if font_name else font_name,
                 'font_size': run.font.size,
-                'font_color': run.font.color.rgb if run.font.color.rgb else None
+                'font_color': sys.intern(str(font_color)) if font_color else None
             }
             formatting['runs'].append(run_formatting)
         
@@ -947,7 +937,12 @@ class DocumentProcessor:
             output_dir = Path(output_path).parent
             output_dir.mkdir(parents=True, exist_ok=True)
             
-            document.save(output_path)
+            # Архив собирается в памяти и записывается на диск одним вызовом,
+            # а не множеством мелких записей zipfile по ходу сжатия частей
+            buffer = io.BytesIO()
+            document.save(buffer)
+            with open(output_path, 'wb') as f:
+                f.write(buffer.getbuffer())
             return True
             
         except Exception as e:
@@ -1031,10 +1026,16 @@ class DocumentProcessor:
                 paragraph.add_run(translated_text)
                 return
             
-            # Извлекаем сегменты форматирования из оригинального текста
-            original_segments = self.formatting_processor.extract_formatting_segments(
-                original_text, formatting_data
-            )
+            # Для простого форматирования достаточно стиля первого run,
+            # иначе извлекаем сегменты форматирования из оригинального текста
+            if self.formatting_processor.has_uniform_formatting(formatting_data):
+                original_segments = self.formatting_processor.get_uniform_segment_fast(
+                    formatting_data, original_text
+                )
+            else:
+                original_segments = self.formatting_processor.extract_formatting_segments(
+                    original_text, formatting_data
+                )
             
             # Используем КОНСЕРВАТИВНОЕ сопоставление форматирования
             translated_segments = self.formatting_processor.map_conservative_formatting_to_translation(
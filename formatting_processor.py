@@ -5,11 +5,26 @@
 
 import re
 from typing import List, Dict, Any, Tuple, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from docx.text.paragraph import Paragraph
 from docx.text.run import Run
-from docx.shared import RGBColor, Pt
+from docx.shared import Length, RGBColor, Pt
 from docx.enum.text import WD_COLOR_INDEX, WD_UNDERLINE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+
+# Символы, которые python-docx в add_run() заменяет отдельными элементами
+_RUN_SPECIAL_CHARS = re.compile(r'([\t\n\r])')
+
+# Проверка "есть ли непробельный символ" без создания копии строки, как в .strip()
+_has_non_whitespace = re.compile(r'\S').search
+
+# Доля элементов данной сложности, при превышении которой документ получает эту сложность
+_DOCUMENT_COMPLEXITY_TABLE = (
+    ('complex', 0.3),
+    ('medium', 0.5),
+)
 
 
 @dataclass
@@ -24,13 +39,34 @@ class FormattingSegment:
     font_color: Optional[str] = None
     start_pos: int = 0
     end_pos: int = 0
+    # Упакованный стиль (bold, italic, underline) для быстрого сравнения одним int
+    style_tag: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.style_tag = _pack_style(self.bold, self.italic, self.underline)
+
+
+def _pack_style(bold, italic, underline) -> int:
+    """Упаковывает (bold, italic, underline) в один int для сравнения стилей"""
+    return _style_code(bold) | (_style_code(italic) << 2) | (_style_code(underline) << 4)
+
+
+def _style_code(value) -> int:
+    """Кодирует значение стиля: 0 - не задано, 1 - False, 2 - True, 3+ - WD_UNDERLINE"""
+    if value is None:
+        return 0
+    if value is True or value is False:
+        return 1 + value
+    # WD_UNDERLINE (одинарное, двойное и т.п.) - целочисленное значение перечисления
+    return 3 + int(value)
 
 
 class FormattingProcessor:
     """Класс для обработки форматирования при переводе"""
     
     def __init__(self):
-        pass
+        # Кэш конвертации размеров: в документе обычно всего 2-3 размера
+        self._size_cache: Dict[int, Optional[float]] = {}
     
     def extract_formatting_segments(self, original_text: str, formatting_data: Dict[str, Any]) -> List[FormattingSegment]:
         """
@@ -60,11 +96,15 @@ class FormattingProcessor:
             if not run_text:
                 continue
                 
-            # Находим позицию этого run в общем тексте
-            text_start = original_text.find(run_text, current_pos)
-            if text_start == -1:
-                # Если не можем найти точное совпадение, используем текущую позицию
+            # Находим позицию этого run в общем тексте. Run'ы обычно идут подряд,
+            # поэтому сначала проверяем совпадение прямо на курсоре (O(len(run)))
+            if original_text.startswith(run_text, current_pos):
                 text_start = current_pos
+            else:
+                text_start = original_text.find(run_text, current_pos)
+                if text_start == -1:
+                    # Если не можем найти точное совпадение, используем текущую позицию
+                    text_start = current_pos
             
             text_end = text_start + len(run_text)
             
@@ -86,30 +126,98 @@ class FormattingProcessor:
         
         return segments
     
+    def has_uniform_formatting(self, formatting_data: Dict[str, Any]) -> bool:
+        """
+        Дешевая проверка, хватит ли для параграфа стиля первого run
+        
+        Консервативное сопоставление при 1-3 сегментах берет только первый, поэтому
+        быстрый путь подходит, если непустых run'ов не больше трех или у всех
+        один и тот же стиль (bold/italic/underline).
+        """
+        count = 0
+        base_tag = None
+        uniform = True
+        
+        for run in formatting_data.get('runs') or ():
+            if not run.get('text'):
+                continue
+            count += 1
+            if uniform:
+                tag = _pack_style(run.get('bold'), run.get('italic'), run.get('underline'))
+                if base_tag is None:
+                    base_tag = tag
+                elif tag != base_tag:
+                    uniform = False
+            if not uniform and count > 3:
+                return False
+        
+        return count > 0
+    
+    def get_uniform_segment_fast(self, formatting_data: Dict[str, Any], text: str) -> List[FormattingSegment]:
+        """
+        Быстрый путь для простого форматирования: один сегмент со стилем первого run
+        
+        Args:
+            formatting_data: Данные форматирования из extract_paragraph_formatting
+            text: Текст, на который распространяется стиль
+            
+        Returns:
+            Список из одного сегмента с форматированием
+        """
+        runs = formatting_data.get('runs') if formatting_data else None
+        first_run = next((run for run in runs if run.get('text')), None) if runs else None
+        
+        if first_run is None:
+            return [FormattingSegment(text=text, start_pos=0, end_pos=len(text))]
+        
+        return [FormattingSegment(
+            text=text,
+            bold=first_run.get('bold'),
+            italic=first_run.get('italic'),
+            underline=first_run.get('underline'),
+            font_name=first_run.get('font_name'),
+            font_size=self._convert_font_size(first_run.get('font_size')),
+            font_color=self._convert_font_color(first_run.get('font_color')),
+            start_pos=0,
+            end_pos=len(text)
+        )]
+    
     def _convert_font_size(self, font_size) -> Optional[float]:
         """Конвертирует размер шрифта в точки"""
         if font_size is None:
             return None
         
+        # Кэшируются только Length (int в EMU): обычный int с тем же значением
+        # конвертируется иначе и не должен попадать в тот же ключ
+        cache_key = int(font_size) if isinstance(font_size, Length) else None
+        if cache_key is not None and cache_key in self._size_cache:
+            return self._size_cache[cache_key]
+        
         # font_size может быть в разных единицах, обычно это Pt объект
         try:
             if hasattr(font_size, 'pt'):
-                return float(font_size.pt)
+                result = float(font_size.pt)
             else:
-                return float(font_size) if font_size else None
+                result = float(font_size) if font_size else None
         except (TypeError, ValueError):
             return None
+        
+        if cache_key is not None:
+            self._size_cache[cache_key] = result
+        return result
     
     def _convert_font_color(self, font_color) -> Optional[str]:
         """Конвертирует цвет шрифта в hex формат"""
         if font_color is None:
             return None
         
+        # extract_paragraph_formatting уже отдает цвет строкой
+        if isinstance(font_color, str):
+            return font_color
+        
         try:
             if hasattr(font_color, 'rgb'):
                 return str(font_color.rgb) if font_color.rgb else None
-            elif isinstance(font_color, str):
-                return font_color
             else:
                 return str(font_color) if font_color else None
         except (TypeError, ValueError):
@@ -160,7 +268,7 @@ class FormattingProcessor:
         """
         Пропорциональное сопоставление форматирования
         """
-        if not translated_text.strip():
+        if not _has_non_whitespace(translated_text):
             return []
         
         total_original_length = len(original_text)
@@ -169,63 +277,38 @@ class FormattingProcessor:
         if total_original_length == 0:
             return [FormattingSegment(text=translated_text, start_pos=0, end_pos=total_translated_length)]
         
-        translated_segments = []
-        current_translated_pos = 0
-        
-        for segment in original_segments:
-            if not segment.text.strip():
-                continue
-            
-            # Вычисляем пропорцию этого сегмента
-            segment_proportion = len(segment.text) / total_original_length
-            
-            # Вычисляем длину соответствующего сегмента в переводе
-            translated_segment_length = max(1, int(segment_proportion * total_translated_length))
-            
-            # Убеждаемся, что не выходим за границы
-            if current_translated_pos + translated_segment_length > total_translated_length:
-                translated_segment_length = total_translated_length - current_translated_pos
-            
-            if translated_segment_length > 0:
-                segment_text = translated_text[current_translated_pos:current_translated_pos + translated_segment_length]
-                
-                translated_segment = FormattingSegment(
-                    text=segment_text,
-                    bold=segment.bold,
-                    italic=segment.italic,
-                    underline=segment.underline,
-                    font_name=segment.font_name,
-                    font_size=segment.font_size,
-                    font_color=segment.font_color,
-                    start_pos=current_translated_pos,
-                    end_pos=current_translated_pos + translated_segment_length
-                )
-                
-                translated_segments.append(translated_segment)
-                current_translated_pos += translated_segment_length
-        
-        # Убеждаемся, что весь переведенный текст покрыт
-        if current_translated_pos < total_translated_length:
-            remaining_text = translated_text[current_translated_pos:]
-            
-            # Используем форматирование последнего сегмента
-            last_segment = original_segments[-1] if original_segments else FormattingSegment(text="")
-            
-            remaining_segment = FormattingSegment(
-                text=remaining_text,
-                bold=last_segment.bold,
-                italic=last_segment.italic,
-                underline=last_segment.underline,
-                font_name=last_segment.font_name,
-                font_size=last_segment.font_size,
-                font_color=last_segment.font_color,
-                start_pos=current_translated_pos,
-                end_pos=total_translated_length
+        # Целочисленные префиксные суммы: граница i-го сегмента в переводе
+        # вычисляется точно, без накопления ошибки округления
+        meaningful_segments = [s for s in original_segments if _has_non_whitespace(s.text)]
+        if not meaningful_segments:
+            # Только пробельные сегменты - используем стиль последнего
+            meaningful_segments = original_segments[-1:]
+        
+        boundaries = []
+        cumulative_length = 0
+        for segment in meaningful_segments:
+            cumulative_length += len(segment.text)
+            boundaries.append(min(total_translated_length,
+                                  (cumulative_length * total_translated_length) // total_original_length))
+        # Последний сегмент всегда доходит до конца перевода - точное разбиение без "хвоста"
+        boundaries[-1] = total_translated_length
+        
+        starts = [0] + boundaries[:-1]
+        return [
+            FormattingSegment(
+                text=translated_text[start:end],
+                bold=segment.bold,
+                italic=segment.italic,
+                underline=segment.underline,
+                font_name=segment.font_name,
+                font_size=segment.font_size,
+                font_color=segment.font_color,
+                start_pos=start,
+                end_pos=end
             )
-            
-            translated_segments.append(remaining_segment)
-        
-        return translated_segments
+            for segment, start, end in zip(meaningful_segments, starts, boundaries)
+            if end > start
+        ]
     
     def apply_formatting_to_paragraph(self, paragraph: Paragraph, 
                                     formatted_segments: List[FormattingSegment],
@@ -242,22 +325,35 @@ class FormattingProcessor:
             True если форматирование применено успешно
         """
         try:
-            # Очищаем параграф
-            paragraph.clear()
+            # Очищаем параграф (только если в нем есть что-то кроме свойств)
+            p_element = paragraph._p
+            if len(p_element) > (0 if p_element.pPr is None else 1):
+                paragraph.clear()
             
             # Применяем выравнивание параграфа
             if paragraph_alignment is not None:
                 paragraph.alignment = paragraph_alignment
             
-            # Добавляем сегменты с форматированием
-            for segment in formatted_segments:
-                if not segment.text:
-                    continue
-                    
-                run = paragraph.add_run(segment.text)
-                
-                # Применяем форматирование к run
-                self._apply_run_formatting(run, segment)
+            # Если все сегменты имеют одинаковый стиль - достаточно одного run
+            if len(formatted_segments) > 1:
+                first = formatted_segments[0]
+                base_tag = first.style_tag
+                if all(s.style_tag == base_tag for s in formatted_segments):
+                    formatted_segments = [FormattingSegment(
+                        text=''.join(s.text for s in formatted_segments),
+                        bold=first.bold,
+                        italic=first.italic,
+                        underline=first.underline
+                    )]
+
+            # Собираем все <w:r> элементы и добавляем их одним вызовом,
+            # минуя медленный paragraph.add_run()
+            run_elements = [
+                self._build_run_element(segment)
+                for segment in formatted_segments
+                if segment.text
+            ]
+            p_element.extend(run_elements)
             
             return True
             
@@ -265,24 +361,51 @@ class FormattingProcessor:
             print(f"Ошибка применения форматирования: {e}")
             return False
     
-    def _apply_run_formatting(self, run: Run, segment: FormattingSegment):
-        """Применяет форматирование к отдельному run - СТРОГИЙ КОНСЕРВАТИВНЫЙ режим"""
-        try:
-            # Применяем только базовое форматирование: жирный, курсив, подчеркивание.
+    def _build_run_element(self, segment: FormattingSegment):
+        """Строит <w:r> элемент для сегмента - СТРОГИЙ КОНСЕРВАТИВНЫЙ режим (только b/i/u)"""
+        r = OxmlElement('w:r')
+        
+        if segment.bold is not None or segment.italic is not None or segment.underline is not None:
+            rPr = OxmlElement('w:rPr')
+            # Порядок дочерних элементов задан схемой: b, i, ..., u
             if segment.bold is not None:
-                run.bold = segment.bold
-            
+                rPr.append(self._build_toggle_element('w:b', segment.bold))
             if segment.italic is not None:
-                run.italic = segment.italic
-            
+                rPr.append(self._build_toggle_element('w:i', segment.italic))
             if segment.underline is not None:
-                run.underline = segment.underline
-            
-            # --- ЦВЕТ И ШРИФТЫ ПОЛНОСТЬЮ ИГНОРИРУЮТСЯ ---
-            # Это предотвращает "протекание" синего цвета и других стилей.
-            
-        except Exception as e:
-            print(f"Ошибка применения базового форматирования к run: {e}")
+                u = OxmlElement('w:u')
+                if segment.underline is True:
+                    u.set(qn('w:val'), 'single')
+                elif segment.underline is False:
+                    u.set(qn('w:val'), 'none')
+                else:
+                    u.set(qn('w:val'), WD_UNDERLINE.to_xml(segment.underline))
+                rPr.append(u)
+            r.append(rPr)
+        
+        # Табуляции и переносы строк превращаем в <w:tab/> и <w:br/>, как это делает add_run
+        for piece in _RUN_SPECIAL_CHARS.split(segment.text):
+            if not piece:
+                continue
+            if piece == '\t':
+                r.append(OxmlElement('w:tab'))
+            elif piece in ('\n', '\r'):
+                r.append(OxmlElement('w:br'))
+            else:
+                t = OxmlElement('w:t')
+                t.text = piece
+                t.set(qn('xml:space'), 'preserve')
+                r.append(t)
+        
+        return r
+    
+    @staticmethod
+    def _build_toggle_element(tag: str, value: bool):
+        """Строит переключаемое свойство run (<w:b/>, <w:i/>)"""
+        element = OxmlElement(tag)
+        if not value:
+            element.set(qn('w:val'), '0')
+        return element
     
     def _apply_font_color(self, run: Run, color_value: str):
         """Применяет цвет шрифта к run - ОТКЛЮЧЕНО для избежания синего выделения"""
@@ -295,7 +418,7 @@ class FormattingProcessor:
         """
         КОНСЕРВАТИВНОЕ сопоставление форматирования - исправляет проблемы с синим выделением
         """
-        if not original_segments or not translated_text.strip():
+        if not original_segments or not _has_non_whitespace(translated_text):
             return [FormattingSegment(
                 text=translated_text,
                 start_pos=0,
@@ -337,7 +460,7 @@ class FormattingProcessor:
         styles = {}
         
         for segment in segments:
-            style_key = f"{segment.bold}_{segment.italic}_{segment.underline}_{segment.font_name}_{segment.font_size}"
+            style_key = (segment.style_tag, segment.font_name, segment.font_size)
             if style_key not in styles:
                 styles[style_key] = {
                     'count': 0,
@@ -377,20 +500,32 @@ class FormattingProcessor:
         
         runs = formatting_data['runs']
         
-        bold_count = sum(1 for run in runs if run.get('bold'))
-        italic_count = sum(1 for run in runs if run.get('italic'))
-        underline_count = sum(1 for run in runs if run.get('underline'))
-        
-        unique_fonts = len(set(run.get('font_name') for run in runs if run.get('font_name')))
-        unique_sizes = len(set(str(run.get('font_size')) for run in runs if run.get('font_size')))
-        unique_colors = len(set(run.get('font_color') for run in runs if run.get('font_color')))
+        # Один проход по run'ам вместо шести генераторов
+        bold_count = italic_count = underline_count = 0
+        fonts = set()
+        sizes = set()
+        colors = set()
+        
+        for run in runs:
+            bold_count += bool(run.get('bold'))
+            italic_count += bool(run.get('italic'))
+            underline_count += bool(run.get('underline'))
+            font_name = run.get('font_name')
+            if font_name:
+                fonts.add(font_name)
+            font_size = run.get('font_size')
+            if font_size:
+                sizes.add(str(font_size))
+            font_color = run.get('font_color')
+            if font_color:
+                colors.add(font_color)
+        
+        unique_fonts = len(fonts)
+        unique_sizes = len(sizes)
+        unique_colors = len(colors)
         
         # Определяем сложность
-        complexity = 'simple'
-        if len(runs) > 3 or unique_fonts > 1 or unique_sizes > 1 or unique_colors > 1:
-            complexity = 'medium'
-        if len(runs) > 6 or unique_fonts > 2 or unique_sizes > 2 or unique_colors > 2:
-            complexity = 'complex'
+        complexity = self._classify_complexity(len(runs), unique_fonts, unique_sizes, unique_colors)
         
         return {
             'complexity': complexity,
@@ -406,6 +541,17 @@ class FormattingProcessor:
             'underline_percentage': (underline_count / len(runs)) * 100 if runs else 0
         }
     
+    @staticmethod
+    def _classify_complexity(total_runs: int, unique_fonts: int, unique_sizes: int, unique_colors: int) -> str:
+        """Определяет сложность форматирования элемента по количеству run'ов и уникальных атрибутов"""
+        # Пороги (run'ов, шрифтов, размеров, цветов): complex - 6/2/2/2, medium - 3/1/1/1;
+        # прямые сравнения вместо цикла по таблице - метод вызывается для каждого элемента
+        if total_runs > 6 or unique_fonts > 2 or unique_sizes > 2 or unique_colors > 2:
+            return 'complex'
+        if total_runs > 3 or unique_fonts > 1 or unique_sizes > 1 or unique_colors > 1:
+            return 'medium'
+        return 'simple'
+    
     def create_formatting_summary(self, all_elements_formatting: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Создает сводку форматирования для всего документа
@@ -430,36 +576,55 @@ class FormattingProcessor:
         all_sizes = set()
         all_colors = set()
         
+        # Один проход по run'ам каждого элемента: без промежуточного словаря
+        # analyze_formatting_complexity и без повторного обхода для уникальных атрибутов
         for formatting_data in all_elements_formatting:
-            analysis = self.analyze_formatting_complexity(formatting_data)
+            runs = formatting_data.get('runs') if formatting_data else None
+            if not runs:
+                complexity_counts['simple'] += 1
+                continue
             
-            complexity_counts[analysis['complexity']] += 1
-            total_runs += analysis['total_runs']
+            has_bold = has_italic = has_underline = False
+            element_fonts = set()
+            element_sizes = set()
+            element_colors = set()
             
-            if analysis['has_bold']:
-                total_bold += 1
-            if analysis['has_italic']:
-                total_italic += 1
-            if analysis['has_underline']:
-                total_underline += 1
+            for run in runs:
+                if run.get('bold'):
+                    has_bold = True
+                if run.get('italic'):
+                    has_italic = True
+                if run.get('underline'):
+                    has_underline = True
+                font_name = run.get('font_name')
+                if font_name:
+                    element_fonts.add(font_name)
+                font_size = run.get('font_size')
+                if font_size:
+                    element_sizes.add(str(font_size))
+                font_color = run.get('font_color')
+                if font_color:
+                    element_colors.add(font_color)
+            
+            complexity = self._classify_complexity(
+                len(runs), len(element_fonts), len(element_sizes), len(element_colors)
+            )
+            complexity_counts[complexity] += 1
+            total_runs += len(runs)
+            total_bold += has_bold
+            total_italic += has_italic
+            total_underline += has_underline
             
-            # Собираем уникальные атрибуты форматирования
-            if formatting_data and 'runs' in formatting_data:
-                for run in formatting_data['runs']:
-                    if run.get('font_name'):
-                        all_fonts.add(run.get('font_name'))
-                    if run.get('font_size'):
-                        all_sizes.add(str(run.get('font_size')))
-                    if run.get('font_color'):
-                        all_colors.add(run.get('font_color'))
+            all_fonts |= element_fonts
+            all_sizes |= element_sizes
+            all_colors |= element_colors
         
         # Определяем общую сложность документа
-        if complexity_counts['complex'] > total_elements * 0.3:
-            overall_complexity = 'complex'
-        elif complexity_counts['medium'] > total_elements * 0.5:
-            overall_complexity = 'medium'
-        else:
-            overall_complexity = 'simple'
+        overall_complexity = next(
+            (complexity for complexity, share in _DOCUMENT_COMPLEXITY_TABLE
+             if complexity_counts[complexity] > total_elements * share),
+            'simple'
+        )
         
         return {
             'total_elements': total_elements,
@@ -2,10 +2,29 @@
 Адаптер для преобразования ImageInfo в ImageElement
 """
 
+import logging
+from functools import lru_cache
 from typing import List, Optional
 from improved_image_processor import ImageInfo, ImageElement
 
 
+logger = logging.getLogger(__name__)
+
+# Разрешение для перевода дюймов в пиксели
+_DPI = 96
+
+
+@lru_cache(maxsize=512)
+def _inches_to_pixels(value: Optional[float]) -> Optional[int]:
+    """Конвертирует дюймы в пиксели (кэшируется: одно изображение часто повторяется в документе)"""
+    if not value:
+        return None
+    if isinstance(value, int):
+        # Целые размеры не требуют float-умножения и приведения типа
+        return value * _DPI
+    return int(value * _DPI)
+
+
 class ImageAdapter:
     """Адаптер для преобразования между ImageInfo и ImageElement"""
     
@@ -20,19 +39,20 @@ class ImageAdapter:
         Returns:
             Элемент изображения в старом формате
         """
-        # Логируем процесс преобразования
-        print(f"🔄 ADAPTER: Преобразование {image_info.image_id} (позиция: {image_info.paragraph_index})")
+        # Логируем процесс преобразования (проверка уровня избавляет от форматирования строки)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"🔄 ADAPTER: Преобразование {image_info.image_id} (позиция: {image_info.paragraph_index})")
         
         return ImageElement(
             image_id=image_info.image_id,
-            image_data=image_info.image_data,
             image_format=image_info.image_format,
-            width=int(image_info.width * 96) if image_info.width else None,  # Конвертируем дюймы в пиксели
-            height=int(image_info.height * 96) if image_info.height else None,  # Конвертируем дюймы в пиксели
+            width=_inches_to_pixels(image_info.width),  # Конвертируем дюймы в пиксели
+            height=_inches_to_pixels(image_info.height),  # Конвертируем дюймы в пиксели
             paragraph_index=image_info.paragraph_index,
             is_inline=True,
             description=image_info.filename,
-            alt_text=f"Изображение {image_info.filename}"
+            alt_text=f"Изображение {image_info.filename}",
+            temp_path=image_info.temp_path  # байты остаются на диске до вставки
         )
     
     @staticmethod
@@ -46,14 +66,15 @@ class ImageAdapter:
         Returns:
             Список элементов изображений в старом формате
         """
-        print(f"🔄 ADAPTER: Преобразование {len(image_infos)} изображений из ImageInfo в ImageElement")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"🔄 ADAPTER: Преобразование {len(image_infos)} изображений из ImageInfo в ImageElement")
         
         elements = [ImageAdapter.convert_to_image_element(info) for info in image_infos]
         
         # Статистика преобразования
-        positioned_count = len([elem for elem in elements if elem.paragraph_index is not None])
-        unpositioned_count = len(elements) - positioned_count
-        
-        print(f"🔄 ADAPTER: Результат - {positioned_count} с позициями, {unpositioned_count} без позиций")
+        if logger.isEnabledFor(logging.DEBUG):
+            positioned_count = len([elem for elem in elements if elem.paragraph_index is not None])
+            unpositioned_count = len(elements) - positioned_count
+            logger.debug(f"🔄 ADAPTER: Результат - {positioned_count} с позициями, {unpositioned_count} без позиций")
         
         return elements 
\ No newline at end of file
@@ -5,11 +5,14 @@
 
 import os
 import io
+import shutil
+import struct
 import tempfile
 import logging
 import zipfile
-import xml.etree.ElementTree as ET
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from lxml import etree as ET
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO
 from dataclasses import dataclass
 from pathlib import Path
 from PIL import Image
@@ -19,24 +22,147 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 
+# Пространства имен и теги OOXML
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+R_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+BODY_TAG = W_NS + 'body'
+P_TAG = W_NS + 'p'
+DRAWING_TAG = W_NS + 'drawing'
+PICT_TAG = W_NS + 'pict'
+BLIP_TAG = A_NS + 'blip'
+EMBED_ATTR = R_NS + 'embed'
+RID_ATTR = R_NS + 'id'
+RELATIONSHIP_TAG = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+IMAGE_REL_TYPE_SUFFIX = '/image'
+
+DOCUMENT_PART = 'word/document.xml'
+DOCUMENT_RELS_PART = 'word/_rels/document.xml.rels'
+
+# Сколько байт заголовка читается для определения формата (все сигнатуры - в первых 12 байтах)
+_FORMAT_HEAD_SIZE = 32
+_MEDIA_WORKERS = 4
+_COPY_BUFFER_SIZE = 1 << 20  # 1 МиБ: меньше системных вызовов на больших изображениях
+_DEFAULT_DPI = 96
+
+# Ограничения размеров вставляемого изображения в дюймах
+_MAX_IMAGE_WIDTH = 6.0
+_MAX_IMAGE_HEIGHT = 8.0
+
+# Маркеры JPEG SOF, содержащие размеры кадра (C4 - DHT, C8 - JPG, CC - DAC не являются SOF)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _read_png_header(f) -> Optional[Tuple[int, int, float, float]]:
+    """Размеры и DPI PNG из IHDR и pHYs (до первого IDAT)"""
+    f.seek(8)
+    length, chunk_type = struct.unpack('>I4s', f.read(8))
+    if chunk_type != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', f.read(8))
+    f.seek(length - 8 + 4, os.SEEK_CUR)
+    dpi_x = dpi_y = _DEFAULT_DPI
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', chunk_header)
+        if chunk_type == b'IDAT' or chunk_type == b'IEND':
+            break
+        if chunk_type == b'pHYs' and length >= 9:
+            px, py, unit = struct.unpack('>IIB', f.read(9))
+            if unit == 1:
+                dpi_x, dpi_y = px * 0.0254, py * 0.0254
+            f.seek(length - 9 + 4, os.SEEK_CUR)
+        else:
+            f.seek(length + 4, os.SEEK_CUR)
+    return width, height, dpi_x, dpi_y
+
+
+def _read_jpeg_header(f) -> Optional[Tuple[int, int, float, float]]:
+    """Размеры JPEG из SOF и DPI из JFIF; None если DPI задан не в JFIF (нужен PIL)"""
+    f.seek(2)
+    dpi = None
+    while True:
+        marker_header = f.read(4)
+        if len(marker_header) < 4 or marker_header[0] != 0xFF:
+            return None
+        marker = marker_header[1]
+        length = struct.unpack('>H', marker_header[2:])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', f.read(5))
+            if dpi is None:
+                return None
+            return width, height, dpi[0], dpi[1]
+        if marker == 0xE0 and length >= 16:
+            segment = f.read(length - 2)
+            if segment.startswith(b'JFIF') and segment[7] == 1:
+                dpi = struct.unpack('>HH', segment[8:12])
+        elif marker == 0xDA:
+            return None
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def _read_gif_header(f) -> Optional[Tuple[int, int, float, float]]:
+    """Размеры GIF из логического экрана (DPI в GIF не хранится)"""
+    f.seek(6)
+    width, height = struct.unpack('<HH', f.read(4))
+    return width, height, _DEFAULT_DPI, _DEFAULT_DPI
+
+
+# Сигнатуры форматов по длине префикса: одна проверка словаря вместо цепочки startswith
+_SIGNATURES_4 = {b'\x89PNG': 'png', b'GIF8': 'gif', b'RIFF': 'webp'}
+_SIGNATURES_3 = {b'\xFF\xD8\xFF': 'jpeg'}
+_SIGNATURES_2 = {b'BM': 'bmp'}
+_GIF_VERSIONS = (b'7a', b'9a')
+
+_HEADER_READERS = {
+    'png': _read_png_header,
+    'jpeg': _read_jpeg_header,
+    'gif': _read_gif_header,
+}
+
+
+def _scale_to_page(width: float, height: float) -> Tuple[float, float]:
+    """Вписывает размеры изображения в ограничения страницы с сохранением пропорций"""
+    scaled_width = min(width, _MAX_IMAGE_WIDTH)
+    scaled_height = min(height, _MAX_IMAGE_HEIGHT)
+    
+    if scaled_width / width < scaled_height / height:
+        scaled_height = scaled_width * (height / width)
+    else:
+        scaled_width = scaled_height * (width / height)
+    return scaled_width, scaled_height
+
+
 @dataclass
 class ImageInfo:
     """Класс для хранения информации об изображении"""
     image_id: str
-    image_data: bytes
     image_format: str
     width: Optional[float] = None
     height: Optional[float] = None
     paragraph_index: Optional[int] = None
     rel_id: Optional[str] = None
     filename: Optional[str] = None
+    temp_path: Optional[str] = None
+    file_size: int = 0
+    scaled_width: Optional[float] = None
+    scaled_height: Optional[float] = None
+    
+    @property
+    def image_data(self) -> bytes:
+        """Байты изображения, читаются из временного файла по требованию"""
+        with open(self.temp_path, 'rb') as f:
+            return f.read()
 
 
 @dataclass
 class ImageElement:
     """Класс для хранения элемента изображения (совместимость с удаленным image_processor)"""
     image_id: str
-    image_data: bytes
     image_format: str
     width: Optional[int] = None
     height: Optional[int] = None
@@ -44,6 +170,13 @@ class ImageElement:
     is_inline: bool = True
     description: Optional[str] = None
     alt_text: Optional[str] = None
+    temp_path: Optional[str] = None
+    
+    @property
+    def image_data(self) -> bytes:
+        """Байты изображения, читаются из временного файла по требованию"""
+        with open(self.temp_path, 'rb') as f:
+            return f.read()
 
 
 class ImprovedImageProcessor:
@@ -53,6 +186,8 @@ class ImprovedImageProcessor:
         self.logger = logging.getLogger(__name__)
         self.temp_dir = None
         self.images: List[ImageInfo] = []
+        self._last_paragraphs_count: Optional[int] = None
+        self._image_rel_ids: set = set()
         
     def extract_images_from_docx(self, docx_path: str) -> List[ImageInfo]:
         """
@@ -79,41 +214,59 @@ class ImprovedImageProcessor:
                 # Ищем изображения в папке word/media/
                 media_files = [f for f in file_list if f.startswith('word/media/')]
                 
+                # Каждая XML часть читается из архива один раз, потоком;
+                # парсеры получают только поток и не зависят от ZipFile
                 # Парсим relationships для получения связей
-                relationships = self._parse_relationships(docx_zip)
+                with self._open_part(docx_zip, DOCUMENT_RELS_PART) as rels_stream:
+                    relationships = self._parse_relationships(rels_stream)
                 
                 # Парсим основной документ для поиска позиций изображений
-                image_positions = self._parse_document_for_images(docx_zip)
+                with self._open_part(docx_zip, DOCUMENT_PART) as document_stream:
+                    image_positions = self._parse_document_for_images(document_stream)
+                
+                # Индекс имя файла -> rel_id для поиска связи каждого медиа файла за O(1)
+                media_index = self._build_media_index(relationships)
                 
                 # Сохраняем результаты для логирования
                 self._last_relationships = relationships
                 self._last_positions = image_positions
                 
-                self.logger.info(f"Найдено {len(media_files)} медиа файлов и {len(relationships)} relationships")
-                self.logger.info(f"Найдено {len(image_positions)} позиций изображений в документе")
+                self.logger.info("\n".join([
+                    f"Найдено {len(media_files)} медиа файлов и {len(relationships)} relationships",
+                    f"Найдено {len(image_positions)} позиций изображений в документе"
+                ]))
+                
+                # Распаковка, определение формата и размеров независимы для каждого файла -
+                # выполняем их параллельно (ZipFile сериализует доступ к файлу архива сам)
+                extracted = []
+                if media_files:
+                    with ThreadPoolExecutor(max_workers=min(_MEDIA_WORKERS, len(media_files))) as executor:
+                        extracted = list(executor.map(
+                            self._extract_media_file,
+                            [docx_zip] * len(media_files), media_files, range(len(media_files))
+                        ))
                 
-                # Обрабатываем каждое медиа файл
+                # Обрабатываем каждое медиа файл (в исходном порядке, ID назначаются последовательно)
                 positioned_images = 0
                 unpositioned_images = 0
                 
-                for media_file in media_files:
+                for media_file, extracted_media in zip(media_files, extracted):
+                    if extracted_media is None:
+                        continue
+                    
                     try:
-                        # Извлекаем данные изображения
-                        image_data = docx_zip.read(media_file)
-                        
-                        # Определяем формат
-                        image_format = self._detect_image_format(image_data)
+                        part_path, image_format, width, height = extracted_media
                         
-                        if image_format == 'unknown':
-                            self.logger.warning(f"Неизвестный формат изображения: {media_file}")
-                            continue
-                        
-                        # Создаем ID
+                        # Переименовываем файл по итоговому ID изображения
                         image_id = f"extracted_{len(images) + 1}"
+                        temp_path = os.path.join(self.temp_dir, f"{image_id}.{image_format}")
+                        os.replace(part_path, temp_path)
+                        
                         filename = os.path.basename(media_file)
+                        file_size = docx_zip.getinfo(media_file).file_size
                         
                         # Ищем информацию о позиции
-                        rel_id = self._find_rel_id_for_media(media_file, relationships)
+                        rel_id = self._find_rel_id_for_media(media_file, media_index)
                         paragraph_index = image_positions.get(rel_id)
                         
                         # Подсчитываем изображения с позициями
@@ -124,125 +277,206 @@ class ImprovedImageProcessor:
                             unpositioned_images += 1
                             self.logger.warning(f"Изображение {filename} -> rel_id: {rel_id} -> позиция не найдена")
                         
-                        # Получаем размеры изображения
-                        width, height = self._get_image_dimensions(image_data)
-                        
-                        # Сохраняем изображение во временную папку
-                        temp_path = os.path.join(self.temp_dir, f"{image_id}.{image_format}")
-                        with open(temp_path, 'wb') as f:
-                            f.write(image_data)
+                        # Размеры для вставки считаем один раз при извлечении
+                        scaled_width = scaled_height = None
+                        if width and height:
+                            scaled_width, scaled_height = _scale_to_page(width, height)
                         
                         # Создаем объект информации об изображении
                         image_info = ImageInfo(
                             image_id=image_id,
-                            image_data=image_data,
                             image_format=image_format,
                             width=width,
                             height=height,
                             paragraph_index=paragraph_index,
                             rel_id=rel_id,
-                            filename=filename
+                            filename=filename,
+                            temp_path=temp_path,
+                            file_size=file_size,
+                            scaled_width=scaled_width,
+                            scaled_height=scaled_height
                         )
                         
                         images.append(image_info)
-                        self.logger.info(f"Извлечено изображение: {filename} ({image_format}, {len(image_data)} байт)")
+                        self.logger.info(f"Извлечено изображение: {filename} ({image_format}, {file_size} байт)")
                         
                     except Exception as e:
                         self.logger.warning(f"Ошибка обработки медиа файла {media_file}: {e}")
                         continue
             
             self.images = images
-            self.logger.info(f"Всего извлечено изображений: {len(images)}")
-            self.logger.info(f"Изображений с найденными позициями: {positioned_images}")
-            self.logger.info(f"Изображений без позиций: {unpositioned_images}")
+            # Итог одной записью: одно форматирование и одна блокировка обработчиков вместо трех
+            self.logger.info("\n".join([
+                f"Всего извлечено изображений: {len(images)}",
+                f"Изображений с найденными позициями: {positioned_images}",
+                f"Изображений без позиций: {unpositioned_images}"
+            ]))
             
         except Exception as e:
             self.logger.error(f"Ошибка извлечения изображений из {docx_path}: {e}")
             
         return images
     
-    def _parse_relationships(self, docx_zip: zipfile.ZipFile) -> Dict[str, str]:
-        """Парсит файл relationships для получения связей между ID и файлами"""
-        relationships = {}
+    def _extract_media_file(self, docx_zip: zipfile.ZipFile, media_file: str,
+                            media_number: int) -> Optional[Tuple[str, str, Optional[float], Optional[float]]]:
+        """
+        Распаковывает один медиа файл во временную папку (выполняется в пуле потоков)
         
+        Returns:
+            (путь к временному файлу, формат, ширина, высота) или None если файл не изображение
+        """
         try:
-            # Читаем word/_rels/document.xml.rels
-            rels_content = docx_zip.read('word/_rels/document.xml.rels')
-            root = ET.fromstring(rels_content)
+            # Читаем медиа файл потоком: в памяти держим только заголовок
+            with docx_zip.open(media_file) as src:
+                head = src.read(_FORMAT_HEAD_SIZE)
+                image_format = self._detect_format_by_signature(head)
+                
+                if image_format is None:
+                    # Редкий формат - PIL читает его прямо из потока архива
+                    src.seek(0)
+                    image_format = self._detect_image_format(src)
+                    src.seek(0)
+                    head = b''
+                
+                if image_format == 'unknown':
+                    self.logger.warning(f"Неизвестный формат изображения: {media_file}")
+                    return None
+                
+                # Сохраняем изображение во временную папку под временным именем
+                part_path = os.path.join(self.temp_dir, f"media_{media_number}.part")
+                with open(part_path, 'wb') as f:
+                    f.write(head)
+                    shutil.copyfileobj(src, f, _COPY_BUFFER_SIZE)
+            
+            # Получаем размеры изображения по заголовку файла
+            width, height = self._get_image_dimensions(part_path, image_format)
+            return part_path, image_format, width, height
             
-            # Парсим relationships
-            for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
-                rel_id = rel.get('Id')
-                target = rel.get('Target')
+        except Exception as e:
+            self.logger.warning(f"Ошибка обработки медиа файла {media_file}: {e}")
+            return None
+    
+    @staticmethod
+    def _open_part(docx_zip: zipfile.ZipFile, part_name: str) -> BinaryIO:
+        """Открывает часть архива потоком; отсутствующая часть дает пустой поток (ошибку сообщит парсер)"""
+        try:
+            return docx_zip.open(part_name)
+        except KeyError:
+            return io.BytesIO()
+    
+    def _parse_relationships(self, rels_stream: BinaryIO) -> Dict[str, str]:
+        """Парсит поток word/_rels/document.xml.rels для получения связей между ID и файлами"""
+        relationships = {}
+        
+        try:
+            # Потоково читаем relationships, получая только элементы Relationship
+            for _, rel in ET.iterparse(rels_stream, events=('end',), tag=RELATIONSHIP_TAG):
                 rel_type = rel.get('Type')
                 
-                # Интересуют только изображения
-                if rel_type and 'image' in rel_type.lower():
-                    relationships[rel_id] = target
+                # Интересуют только изображения (тип .../relationships/image)
+                if rel_type and rel_type.endswith(IMAGE_REL_TYPE_SUFFIX):
+                    relationships[rel.get('Id')] = rel.get('Target')
+                rel.clear()
                     
         except Exception as e:
             self.logger.warning(f"Ошибка парсинга relationships: {e}")
+        
+        self._image_rel_ids = set(relationships)
             
         return relationships
     
-    def _parse_document_for_images(self, docx_zip: zipfile.ZipFile) -> Dict[str, int]:
+    def _parse_document_for_images(self, document_stream: BinaryIO) -> Dict[str, int]:
         """
-        ИСПРАВЛЕННЫЙ парсинг основного документа для поиска позиций изображений.
+        ИСПРАВЛЕННЫЙ парсинг основного документа (поток word/document.xml) для поиска позиций изображений.
         Эта версия напрямую сопоставляет индексы XML параграфов с индексами python-docx.
         """
         image_positions = {}
+        self._last_paragraphs_count = None
         
         try:
-            # Читаем word/document.xml
-            doc_content = docx_zip.read('word/document.xml')
-            root = ET.fromstring(doc_content)
+            # Потоково разбираем word/document.xml: обработанные элементы тела сразу
+            # освобождаются, поэтому память не растет с размером документа.
+            # Параграфы нумеруются в порядке открывающих тегов - так же, как body.iter(P_TAG),
+            # поэтому индексы совпадают со списком всех параграфов тела документа.
+            # Учитываем ТОЛЬКО параграфы в основном теле документа (исключаем headers, footers, etc.)
+            body_found = False
+            in_body = False
+            paragraph_stack: List[int] = []
+            paragraphs_count = 0
+            drawing_depth = 0
+            pict_depth = 0
+            debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
             
-            # Ищем ТОЛЬКО параграфы в основном теле документа (исключаем headers, footers, etc.)
-            body = root.find('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}body')
-            if body is None:
+            for event, element in ET.iterparse(document_stream, events=('start', 'end')):
+                tag = element.tag
+                
+                if tag == BODY_TAG:
+                    in_body = event == 'start'
+                    body_found = True
+                    continue
+                if not in_body:
+                    continue
+                
+                if event == 'end':
+                    if tag == P_TAG:
+                        paragraph_stack.pop()
+                    elif tag == DRAWING_TAG:
+                        drawing_depth -= 1
+                    elif tag == PICT_TAG:
+                        pict_depth -= 1
+                    
+                    # Элемент верхнего уровня тела разобран - освобождаем его и предшественников
+                    parent = element.getparent()
+                    if parent is not None and parent.tag == BODY_TAG:
+                        element.clear()
+                        while element.getprevious() is not None:
+                            del parent[0]
+                    continue
+                
+                if tag == P_TAG:
+                    paragraph_stack.append(paragraphs_count)
+                    paragraphs_count += 1
+                elif tag == DRAWING_TAG:
+                    drawing_depth += 1
+                elif tag == PICT_TAG:
+                    pict_depth += 1
+                elif not paragraph_stack:
+                    continue
+                # 1. Современный формат (drawing): изображение относится к ближайшему параграфу
+                elif drawing_depth and tag == BLIP_TAG:
+                    rel_id = element.get(EMBED_ATTR)
+                    if rel_id:
+                        paragraph_index = paragraph_stack[-1]
+                        image_positions[rel_id] = paragraph_index
+                        if debug_enabled:
+                            self.logger.debug(f"Найдено изображение (drawing): {rel_id} -> параграф {paragraph_index}")
+                # 2. Старый формат (pict): сохраняется первое (внешнее) вхождение
+                elif pict_depth:
+                    rel_id = element.get(RID_ATTR)
+                    if rel_id and rel_id not in image_positions and self._is_image_relationship(rel_id):
+                        paragraph_index = paragraph_stack[0]
+                        image_positions[rel_id] = paragraph_index
+                        if debug_enabled:
+                            self.logger.debug(f"Найдено изображение (pict): {rel_id} -> параграф {paragraph_index}")
+            
+            if not body_found:
                 self.logger.warning("Не найден body элемент в документе")
                 return image_positions
             
-            # Получаем ВСЕ параграфы из body. Их порядок и количество точно соответствуют
-            # списку document.paragraphs в библиотеке python-docx.
-            all_paragraphs_in_body = body.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p')
-            
-            self.logger.info(f"🔍 XML парсер: найдено {len(all_paragraphs_in_body)} параграфов в теле документа.")
-            print(f"🔍 XML парсер: найдено {len(all_paragraphs_in_body)} параграфов в теле документа.")
+            # Сохраняем количество параграфов, чтобы валидация не разбирала document.xml повторно
+            self._last_paragraphs_count = paragraphs_count
             
-            # Перебираем все параграфы и используем их порядковый номер как индекс
-            for paragraph_index, paragraph_element in enumerate(all_paragraphs_in_body):
-                
-                # --- Ищем relationship ID (rel_id) изображения внутри параграфа ---
-                
-                # 1. Современный формат (drawing)
-                drawings = paragraph_element.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}drawing')
-                for drawing in drawings:
-                    blips = drawing.findall('.//{http://schemas.openxmlformats.org/drawingml/2006/main}blip')
-                    for blip in blips:
-                        rel_id = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
-                        if rel_id:
-                            image_positions[rel_id] = paragraph_index
-                            self.logger.debug(f"Найдено изображение (drawing): {rel_id} -> параграф {paragraph_index}")
-
-                # 2. Старый формат (pict)
-                picts = paragraph_element.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}pict')
-                for pict in picts:
-                    shapes = pict.findall('.//*[@r:id]', namespaces={'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'})
-                    for shape in shapes:
-                        rel_id = shape.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id')
-                        if rel_id and rel_id not in image_positions:
-                             image_positions[rel_id] = paragraph_index
-                             self.logger.debug(f"Найдено изображение (pict): {rel_id} -> параграф {paragraph_index}")
+            self.logger.info(f"🔍 XML парсер: найдено {paragraphs_count} параграфов в теле документа.")
+            print(f"🔍 XML парсер: найдено {paragraphs_count} параграфов в теле документа.")
 
             # Финальная статистика
             self.logger.info(f"🎯 ИТОГО найдено позиций изображений: {len(image_positions)}")
             print(f"🎯 ИТОГО найдено позиций изображений: {len(image_positions)}")
             
-            # Детальный вывод всех найденных позиций
-            for rel_id, para_idx in sorted(image_positions.items(), key=lambda x: x[1]):
-                self.logger.info(f"  📌 Изображение {rel_id} -> параграф {para_idx}")
-                print(f"  📌 Изображение {rel_id} -> параграф {para_idx}")
+            # Детальный вывод всех найденных позиций (только в режиме отладки)
+            if debug_enabled:
+                for rel_id, para_idx in sorted(image_positions.items(), key=lambda x: x[1]):
+                    self.logger.debug(f"  📌 Изображение {rel_id} -> параграф {para_idx}")
 
         except Exception as e:
             self.logger.error(f"❌ Ошибка ИСПРАВЛЕННОГО парсинга документа для изображений: {e}")
@@ -250,72 +484,99 @@ class ImprovedImageProcessor:
             
         return image_positions
     
-    def _find_rel_id_for_media(self, media_file: str, relationships: Dict[str, str]) -> Optional[str]:
+    @staticmethod
+    def _build_media_index(relationships: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Строит индексы имя файла -> rel_id и имя без расширения -> rel_id.
+        При совпадении имен сохраняется первый relationship, как при линейном поиске.
+        """
+        by_filename: Dict[str, str] = {}
+        by_stem: Dict[str, str] = {}
+        for rel_id, target in relationships.items():
+            target_filename = os.path.basename(target)
+            by_filename.setdefault(target_filename, rel_id)
+            by_stem.setdefault(os.path.splitext(target_filename)[0], rel_id)
+        return by_filename, by_stem
+    
+    def _find_rel_id_for_media(self, media_file: str,
+                               media_index: Tuple[Dict[str, str], Dict[str, str]]) -> Optional[str]:
         """Находит relationship ID для медиа файла"""
+        by_filename, by_stem = media_index
         media_filename = os.path.basename(media_file)
         
-        # Попытка точного совпадения
-        for rel_id, target in relationships.items():
-            if target.endswith(media_filename):
-                return rel_id
-        
-        # Попытка совпадения без "media/" префикса
-        for rel_id, target in relationships.items():
-            if target.endswith(media_filename) or target.endswith(media_file):
-                return rel_id
+        # Попытка точного совпадения по имени файла
+        rel_id = by_filename.get(media_filename)
+        if rel_id is not None:
+            return rel_id
         
         # Попытка совпадения по имени файла без расширения
-        media_name_without_ext = os.path.splitext(media_filename)[0]
-        for rel_id, target in relationships.items():
-            target_name = os.path.splitext(os.path.basename(target))[0]
-            if target_name == media_name_without_ext:
-                return rel_id
+        rel_id = by_stem.get(os.path.splitext(media_filename)[0])
+        if rel_id is not None:
+            return rel_id
         
         self.logger.warning(f"Не найден relationship ID для медиа файла: {media_file}")
         return None
     
-    def _get_image_dimensions(self, image_data: bytes) -> Tuple[Optional[float], Optional[float]]:
+    def _get_image_dimensions(self, image_path: str, image_format: Optional[str] = None) -> Tuple[Optional[float], Optional[float]]:
         """Получает размеры изображения в дюймах"""
         try:
-            with Image.open(io.BytesIO(image_data)) as img:
-                # Получаем размеры в пикселях
-                width_px, height_px = img.size
-                
-                # Получаем DPI (по умолчанию 96)
-                dpi = img.info.get('dpi', (96, 96))
-                if isinstance(dpi, tuple):
-                    dpi_x, dpi_y = dpi
-                else:
-                    dpi_x = dpi_y = dpi
-                
-                # Конвертируем в дюймы
-                width_inches = width_px / dpi_x
-                height_inches = height_px / dpi_y
-                
-                return width_inches, height_inches
+            # Для PNG/JPEG/GIF достаточно нескольких байт заголовка, PIL - только запасной путь
+            header = None
+            header_reader = _HEADER_READERS.get(image_format)
+            if header_reader is not None:
+                with open(image_path, 'rb') as f:
+                    header = header_reader(f)
+            
+            if header is not None:
+                width_px, height_px, dpi_x, dpi_y = header
+            else:
+                with Image.open(image_path) as img:
+                    # Получаем размеры в пикселях
+                    width_px, height_px = img.size
+                    
+                    # Получаем DPI (по умолчанию 96)
+                    dpi = img.info.get('dpi', (_DEFAULT_DPI, _DEFAULT_DPI))
+                    if isinstance(dpi, tuple):
+                        dpi_x, dpi_y = dpi
+                    else:
+                        dpi_x = dpi_y = dpi
+            
+            # Конвертируем в дюймы
+            width_inches = width_px / dpi_x
+            height_inches = height_px / dpi_y
+            
+            return width_inches, height_inches
                 
         except Exception as e:
             self.logger.warning(f"Не удалось определить размеры изображения: {e}")
             return None, None
     
-    def _detect_image_format(self, image_data: bytes) -> str:
-        """Определяет формат изображения по binary data"""
+    @staticmethod
+    def _detect_format_by_signature(head: bytes) -> Optional[str]:
+        """Определяет формат по сигнатуре в заголовке файла, None если сигнатура не известна"""
+        image_format = (_SIGNATURES_4.get(head[:4])
+                        or _SIGNATURES_3.get(head[:3])
+                        or _SIGNATURES_2.get(head[:2]))
+        
+        # GIF и WebP требуют уточнения по следующим байтам
+        if image_format == 'gif' and head[4:6] not in _GIF_VERSIONS:
+            return None
+        if image_format == 'webp' and b'WEBP' not in head[:12]:
+            return None
+        return image_format
+    
+    def _detect_image_format(self, image_stream: BinaryIO) -> str:
+        """Определяет формат изображения по потоку данных (без копирования в BytesIO)"""
         try:
             # Проверяем сигнатуры файлов
-            if image_data.startswith(b'\x89PNG'):
-                return 'png'
-            elif image_data.startswith(b'\xFF\xD8\xFF'):
-                return 'jpeg'
-            elif image_data.startswith(b'GIF87a') or image_data.startswith(b'GIF89a'):
-                return 'gif'
-            elif image_data.startswith(b'BM'):
-                return 'bmp'
-            elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:12]:
-                return 'webp'
-            else:
-                # Попытка определить через PIL
-                with Image.open(io.BytesIO(image_data)) as img:
-                    return img.format.lower()
+            image_format = self._detect_format_by_signature(image_stream.read(_FORMAT_HEAD_SIZE))
+            if image_format is not None:
+                return image_format
+            
+            # Попытка определить через PIL (поток остается открытым)
+            image_stream.seek(0)
+            with Image.open(image_stream) as img:
+                return img.format.lower()
                     
         except Exception as e:
             self.logger.warning(f"Не удалось определить формат изображения: {e}")
@@ -352,23 +613,12 @@ class ImprovedImageProcessor:
     def _insert_single_image(self, document: Document, image_info: ImageInfo) -> bool:
         """Вставляет одно изображение в документ"""
         try:
-            # Определяем позицию для вставки
-            target_paragraph_index = image_info.paragraph_index
-            
-            if target_paragraph_index is None or target_paragraph_index >= len(document.paragraphs):
-                # Вставляем в конец документа
-                paragraph = document.add_paragraph()
-            else:
-                # Получаем существующий параграф или создаем новый рядом
-                if target_paragraph_index < len(document.paragraphs):
-                    # Вставляем после указанного параграфа
-                    target_para = document.paragraphs[target_paragraph_index]
-                    paragraph = document.add_paragraph()
-                else:
-                    paragraph = document.add_paragraph()
+            # Изображение всегда добавляется новым параграфом в конец документа,
+            # поэтому document.paragraphs (перестраивается из XML при каждом обращении) не нужен
+            paragraph = document.add_paragraph()
             
             # Получаем изображение из временной папки
-            temp_path = os.path.join(self.temp_dir, f"{image_info.image_id}.{image_info.image_format}")
+            temp_path = image_info.temp_path or os.path.join(self.temp_dir, f"{image_info.image_id}.{image_info.image_format}")
             
             if not os.path.exists(temp_path):
                 self.logger.warning(f"Файл изображения не найден: {temp_path}")
@@ -377,22 +627,9 @@ class ImprovedImageProcessor:
             # Вставляем изображение
             run = paragraph.add_run()
             
-            # Определяем размеры
-            if image_info.width and image_info.height:
-                # Ограничиваем размеры
-                max_width = 6.0  # максимум 6 дюймов
-                max_height = 8.0  # максимум 8 дюймов
-                
-                width = min(image_info.width, max_width)
-                height = min(image_info.height, max_height)
-                
-                # Сохраняем пропорции
-                if width / image_info.width < height / image_info.height:
-                    height = width * (image_info.height / image_info.width)
-                else:
-                    width = height * (image_info.width / image_info.height)
-                    
-                run.add_picture(temp_path, width=Inches(width), height=Inches(height))
+            # Размеры уже вписаны в страницу при извлечении
+            if image_info.scaled_width and image_info.scaled_height:
+                run.add_picture(temp_path, width=Inches(image_info.scaled_width), height=Inches(image_info.scaled_height))
             else:
                 # Используем размер по умолчанию
                 run.add_picture(temp_path, width=Inches(4.0))
@@ -427,8 +664,8 @@ class ImprovedImageProcessor:
             # Подсчитываем форматы
             formats[image.image_format] = formats.get(image.image_format, 0) + 1
             
-            # Подсчитываем общий размер
-            total_size += len(image.image_data)
+            # Подсчитываем общий размер (без чтения файлов с диска)
+            total_size += image.file_size
         
         return {
             'total_images': len(self.images),
@@ -447,10 +684,8 @@ class ImprovedImageProcessor:
         Returns:
             True если это изображение, False иначе
         """
-        # Расширенная проверка на основе анализа relationship
-        # Пока возвращаем True для всех, но можно добавить фильтрацию по типу
-        self.logger.debug(f"🔍 Проверка relationship {rel_id} на предмет изображения")
-        return True
+        # Множество заполняется в _parse_relationships только relationship'ами изображений
+        return rel_id in self._image_rel_ids
     
     def get_detailed_extraction_log(self) -> str:
         """
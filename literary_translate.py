@@ -6,19 +6,22 @@
 
 import sys
 import os
+import stat
 import argparse
 import asyncio
 from pathlib import Path
 from typing import Optional
 
-# Добавляем текущую директорию в путь Python
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# uvloop - необязательная зависимость: более быстрый цикл событий для параллельных запросов к API
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from config import config
-from document_processor import DocumentProcessor
-from text_chunker import TextChunker
-from translator import DocumentTranslator
-from logger_config import setup_logging, TranslationProgress, TranslationLogger
+
+# Тяжелые модули (python-docx, lxml, PIL, aiohttp, rich) импортируются в функциях,
+# которым они нужны: --help и разбор аргументов их не загружают
 
 
 def parse_arguments():
@@ -72,27 +75,28 @@ def parse_arguments():
 
 def generate_output_filename(input_file: str) -> str:
     """Генерирует имя выходного файла на основе входного"""
-    input_path = Path(input_file)
+    input_dir, input_name = os.path.split(input_file)
     # Создаем имя: translated_original_name.docx
-    output_name = f"translated_{input_path.stem}.docx"
-    output_path = input_path.parent / output_name
-    return str(output_path)
+    output_name = f"translated_{os.path.splitext(input_name)[0]}.docx"
+    return os.path.join(input_dir, output_name)
 
 
 def validate_input_file(input_file: str) -> bool:
     """Проверяет корректность входного файла"""
-    input_path = Path(input_file)
-    
-    if not input_path.exists():
+    # Один stat вместо отдельных exists()/is_file()
+    try:
+        file_stat = os.stat(input_file)
+    except OSError:
         print(f"❌ Входной файл не найден: {input_file}")
         return False
     
-    if not input_path.is_file():
+    if not stat.S_ISREG(file_stat.st_mode):
         print(f"❌ Указанный путь не является файлом: {input_file}")
         return False
     
-    if input_path.suffix.lower() != '.docx':
-        print(f"❌ Поддерживаются только .docx файлы. Получен: {input_path.suffix}")
+    suffix = os.path.splitext(input_file)[1]
+    if suffix.lower() != '.docx':
+        print(f"❌ Поддерживаются только .docx файлы. Получен: {suffix}")
         return False
     
     return True
@@ -115,8 +119,10 @@ def validate_output_file(output_file: str) -> bool:
 
 def test_api_connection() -> bool:
     """Тестирует подключение к API"""
+    from translator import get_translator
+    
     try:
-        translator = DocumentTranslator()
+        translator = get_translator()
         if translator.api_translator.test_connection():
             print("✅ Подключение к OpenRouter API успешно!")
             return True
@@ -130,6 +136,9 @@ def test_api_connection() -> bool:
 
 async def run_translation(args):
     """Асинхронная функция для перевода документа"""
+    from document_processor import DocumentProcessor
+    from logger_config import TranslationLogger
+    
     # Создаем объект для логирования
     logger = TranslationLogger()
     
@@ -155,7 +164,11 @@ async def run_translation(args):
             logger.log_error("Не удалось обработать и перевести документ")
             sys.exit(1)
             
-        if not doc_processor.save_document_with_images(new_document, output_file):
+        # Сжатие и запись .docx - блокирующие операции: выполняем их в потоке,
+        # чтобы не останавливать цикл событий (asyncio.to_thread недоступен в 3.8)
+        loop = asyncio.get_running_loop()
+        
+        if not await loop.run_in_executor(None, doc_processor.save_document_with_images, new_document, output_file):
             logger.log_error("Не удалось сохранить переведенный документ")
             sys.exit(1)
         
@@ -165,7 +178,7 @@ async def run_translation(args):
         xml_file = None
         if args.xml:
             xml_file = str(Path(output_file).with_suffix('.xml'))
-            if not doc_processor.save_as_xml(xml_file):
+            if not await loop.run_in_executor(None, doc_processor.save_as_xml, xml_file):
                 logger.log_error("Не удалось сохранить XML файл")
                 xml_file = None
         
@@ -180,12 +193,26 @@ async def run_translation(args):
         sys.exit(1)
 
 
+def run_async(coro):
+    """Запускает корутину на uvloop, если он установлен, иначе на стандартном цикле asyncio"""
+    if uvloop is None:
+        return asyncio.run(coro)
+    
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    
+    uvloop.install()
+    return asyncio.run(coro)
+
+
 def main():
     """Основная функция программы"""
     # Парсим аргументы
     args = parse_arguments()
     
     # Настраиваем логирование
+    from logger_config import setup_logging
     setup_logging(args.log_level)
     
     # Если нужно только протестировать API
@@ -209,7 +236,7 @@ def main():
     
     try:
         # Запускаем асинхронную функцию перевода
-        asyncio.run(run_translation(args))
+        run_async(run_translation(args))
         
     except KeyboardInterrupt:
         print("❌ Операция была прервана пользователем")
@@ -2,11 +2,15 @@
 Конфигурация логирования для переводчика
 """
 
+import atexit
+import copy
 import logging
+import logging.handlers
+import queue
 import sys
+import time
 from typing import Optional, Callable
 from pathlib import Path
-from datetime import datetime
 
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeRemainingColumn, TaskProgressColumn
@@ -18,6 +22,18 @@ from rich.table import Table
 from config import config
 
 
+# Сколько раз за весь перевод перерисовывать прогресс-бар: на больших документах
+# перерисовка на каждый блок упирается в вывод в терминал
+PROGRESS_REPAINTS = 200
+
+# Общая консоль Rich: определение возможностей терминала выполняется один раз,
+# а весь вывод (логи, прогресс, панели) идет через одну блокировку
+_CONSOLE = Console()
+
+# Поток, обслуживающий очередь логов (создается в setup_logging)
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+
 class ColoredFormatter(logging.Formatter):
     """Форматтер для цветного логирования"""
     
@@ -35,6 +51,23 @@ class ColoredFormatter(logging.Formatter):
         return super().format(record)
 
 
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler для очереди внутри процесса: сохраняет exc_info записи
+    
+    Стандартный prepare() форматирует запись и удаляет exc_info, из-за чего
+    RichHandler(rich_tracebacks=True) не получает исключение для отрисовки.
+    Записи не сериализуются, поэтому трейсбек можно передать слушателю как есть.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Аргументы подставляются сразу: изменяемые объекты могут поменяться до записи
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
 def setup_logging(log_level: str = None) -> logging.Logger:
     """
     Настраивает логирование для приложения
@@ -48,15 +81,12 @@ def setup_logging(log_level: str = None) -> logging.Logger:
     if log_level is None:
         log_level = config.log_level
     
-    # Создаем консоль Rich
-    console = Console()
-    
     # Создаем директорию для логов если она не существует
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
     
     # Создаем имя файла лога с датой
-    log_file = log_dir / f"translation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    log_file = log_dir / time.strftime("translation_%Y%m%d_%H%M%S.log")
     
     # Настраиваем root logger
     root_logger = logging.getLogger()
@@ -68,7 +98,7 @@ def setup_logging(log_level: str = None) -> logging.Logger:
     
     # Создаем Rich handler для консоли
     rich_handler = RichHandler(
-        console=console,
+        console=_CONSOLE,
         rich_tracebacks=True,
         show_time=True,
         show_level=True,
@@ -95,24 +125,44 @@ def setup_logging(log_level: str = None) -> logging.Logger:
     rich_handler.setFormatter(console_formatter)
     file_handler.setFormatter(file_formatter)
     
-    # Добавляем handlers
-    root_logger.addHandler(rich_handler)
-    root_logger.addHandler(file_handler)
+    # Вывод в консоль и запись в файл выполняет отдельный поток: вызовы логгера
+    # только кладут запись в очередь и не блокируют цикл событий на вводе-выводе
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+    
+    log_queue = queue.Queue(-1)
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, rich_handler, file_handler, respect_handler_level=True
+    )
+    _log_listener.start()
+    
+    root_logger.addHandler(_LocalQueueHandler(log_queue))
     
     return root_logger
 
 
+def _stop_log_listener():
+    """Дописывает оставшиеся в очереди записи логов при завершении программы"""
+    if _log_listener is not None:
+        _log_listener.stop()
+
+
+atexit.register(_stop_log_listener)
+
+
 class TranslationProgress:
     """Класс для отображения прогресса перевода"""
     
     def __init__(self, total_chunks: int):
-        self.console = Console()
+        self.console = _CONSOLE
         self.total_chunks = total_chunks
         self.progress = None
         self.task_id = None
         self.successful = 0
         self.failed = 0
         self.start_time = None
+        self.repaint_step = max(1, total_chunks // PROGRESS_REPAINTS)
         
     def __enter__(self):
         self.progress = Progress(
@@ -150,6 +200,10 @@ class TranslationProgress:
         else:
             self.failed += 1
         
+        # Счетчики обновляются всегда, а перерисовка - раз в repaint_step блоков и на последнем
+        if completed % self.repaint_step and completed != total:
+            return
+        
         if self.progress and self.task_id is not None:
             self.progress.update(
                 self.task_id,
@@ -185,7 +239,7 @@ class TranslationLogger:
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self.console = Console()
+        self.console = _CONSOLE
     
     def log_start(self, input_file: str, output_file: str):
         """Логирует начало перевода"""
@@ -26,6 +26,19 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/your-repo/literary-translator",
     packages=find_packages(),
+    # Модули лежат в корне проекта: ставим их явно, чтобы консольная команда
+    # literary-translate импортировала их без правки sys.path
+    py_modules=[
+        "config",
+        "document_processor",
+        "formatting_processor",
+        "image_adapter",
+        "improved_image_processor",
+        "literary_translate",
+        "logger_config",
+        "text_chunker",
+        "translator",
+    ],
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Developers",
@@ -50,6 +63,11 @@ setup(
             "flake8>=4.0.0",
             "mypy>=0.900",
         ],
+        "speed": [
+            "uvloop>=0.17.0; sys_platform != 'win32'",
+            "orjson>=3.9.0",
+            "tiktoken>=0.7.0",
+        ],
     },
     entry_points={
         "console_scripts": [
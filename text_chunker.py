@@ -3,12 +3,24 @@
 """
 
 import re
-from typing import List, Tuple
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Tuple
 from dataclasses import dataclass
 
+
+# Границы параграфов (пустая строка) и предложений - компилируются один раз.
+# Разделитель предложений - пробелы после [.!?] (группа 1): те же совпадения, что
+# у (?<=[.!?])\s+, но без проверки lookbehind в каждой позиции
+_PARAGRAPH_SPLIT = re.compile(r'\n\s*\n')
+_SENTENCE_SPLIT = re.compile(r'[.!?](\s+)')
+
+
 @dataclass
 class TextChunk:
     """Класс для хранения блока текста с метаданными"""
+    # Без __dict__ на каждый экземпляр: блоков в документе может быть много
+    __slots__ = ('text', 'start_index', 'end_index', 'paragraph_index', 'is_complete_paragraph')
+    
     text: str
     start_index: int
     end_index: int
@@ -22,152 +34,217 @@ class TextChunker:
     def __init__(self, max_chunk_size: int = 45000):
         self.max_chunk_size = max_chunk_size
         
-    def chunk_text(self, text: str) -> List[TextChunk]:
+    def chunk_text(self, text: str) -> Iterator[TextChunk]:
         """
         Разбивает текст на смысловые блоки
         
+        Блоки выдаются по мере разбиения, поэтому потребитель может переводить
+        их, не держа в памяти весь список (для статистики - list(...)).
+        
         Args:
             text: Исходный текст для разбивки
             
         Returns:
-            Список блоков текста
+            Итератор блоков текста
         """
         if not text.strip():
-            return []
+            return
             
         # Разбиваем на параграфы
         paragraphs = self._split_into_paragraphs(text)
-        chunks = []
-        current_chunk = ""
-        current_start = 0
-        paragraph_indices = []
         
-        for i, paragraph in enumerate(paragraphs):
-            # Если параграф сам по себе больше лимита, разбиваем его
+        # Параграфы, которые помещаются в лимит, копятся в отрезок и делятся на блоки
+        # целиком; слишком длинный параграф завершает отрезок и режется по предложениям
+        segment: List[Tuple[int, int, int, str]] = []
+        
+        for i, (start, end, paragraph) in enumerate(paragraphs):
             if len(paragraph) > self.max_chunk_size:
-                # Сохраняем текущий чанк если он не пустой
-                if current_chunk.strip():
-                    chunks.append(TextChunk(
-                        text=current_chunk.strip(),
-                        start_index=current_start,
-                        end_index=current_start + len(current_chunk),
-                        paragraph_index=paragraph_indices[0] if paragraph_indices else i,
-                        is_complete_paragraph=len(paragraph_indices) == 1
-                    ))
+                yield from self._chunk_segment(segment)
+                segment = []
                 
                 # Разбиваем большой параграф на предложения
-                long_paragraph_chunks = self._split_long_paragraph(paragraph, i)
-                chunks.extend(long_paragraph_chunks)
-                
-                # Обновляем позиции
-                current_start += len(current_chunk) + len(paragraph)
-                current_chunk = ""
-                paragraph_indices = []
-                
-            # Если добавление параграфа не превышает лимит
-            elif len(current_chunk) + len(paragraph) <= self.max_chunk_size:
-                current_chunk += paragraph
-                paragraph_indices.append(i)
-                
-            # Если добавление параграфа превышает лимит
+                yield from self._split_long_paragraph(paragraph, i, start)
             else:
-                # Сохраняем текущий чанк
-                if current_chunk.strip():
-                    chunks.append(TextChunk(
-                        text=current_chunk.strip(),
-                        start_index=current_start,
-                        end_index=current_start + len(current_chunk),
-                        paragraph_index=paragraph_indices[0] if paragraph_indices else i,
-                        is_complete_paragraph=len(paragraph_indices) == 1
-                    ))
-                
-                # Начинаем новый чанк
-                current_start += len(current_chunk)
-                current_chunk = paragraph
-                paragraph_indices = [i]
+                segment.append((i, start, end, paragraph))
         
-        # Добавляем последний чанк
-        if current_chunk.strip():
-            chunks.append(TextChunk(
-                text=current_chunk.strip(),
-                start_index=current_start,
-                end_index=current_start + len(current_chunk),
-                paragraph_index=paragraph_indices[0] if paragraph_indices else len(paragraphs) - 1,
-                is_complete_paragraph=len(paragraph_indices) == 1
-            ))
+        yield from self._chunk_segment(segment)
+    
+    def _chunk_segment(self, segment: List[Tuple[int, int, int, str]]) -> Iterator[TextChunk]:
+        """Выдает блоки для отрезка подряд идущих параграфов (индекс, начало, конец, параграф)"""
+        if not segment:
+            return
+        
+        boundaries = self._balanced_boundaries([len(paragraph) for _, _, _, paragraph in segment])
         
-        return chunks
+        for first, last in zip(boundaries, boundaries[1:]):
+            group = segment[first:last]
+            # Части склеиваются один раз на блок; start/end - границы блока в исходном тексте
+            yield TextChunk(
+                text=''.join(paragraph for _, _, _, paragraph in group).strip(),
+                start_index=group[0][1],
+                end_index=group[-1][2],
+                paragraph_index=group[0][0],
+                is_complete_paragraph=len(group) == 1
+            )
     
-    def _split_into_paragraphs(self, text: str) -> List[str]:
-        """Разбивает текст на параграфы"""
-        # Разбиваем по двойным переносам строк
-        paragraphs = re.split(r'\n\s*\n', text)
-        
-        # Очищаем параграфы от лишних пробелов, но сохраняем структуру
-        cleaned_paragraphs = []
-        for paragraph in paragraphs:
-            cleaned = paragraph.strip()
-            if cleaned:
-                cleaned_paragraphs.append(cleaned + '\n\n')
-        
-        return cleaned_paragraphs
+    def _balanced_boundaries(self, lengths: List[int]) -> List[int]:
+        """
+        Делит параграфы на блоки не длиннее max_chunk_size
+        
+        Блоков столько же, сколько дало бы жадное заполнение (меньше запросов
+        к API не бывает), но среди таких разбиений выбирается самое ровное -
+        с минимальной суммой квадратов длин блоков. Так не остается крошечного
+        последнего блока. Динамика по префиксам: для каждого префикса хранится
+        (число блоков, сумма квадратов), кандидаты - только окно параграфов,
+        помещающихся в лимит.
+        
+        Returns:
+            Границы блоков: [0, ..., len(lengths)]
+        """
+        count = len(lengths)
+        prefix = list(accumulate(lengths, initial=0))
+        if prefix[-1] <= self.max_chunk_size:
+            return [0, count]
+        
+        best_chunks = [0] * (count + 1)
+        best_cost = [0] * (count + 1)
+        previous = [0] * (count + 1)
+        window_start = 0
+        
+        for end in range(1, count + 1):
+            while prefix[end] - prefix[window_start] > self.max_chunk_size:
+                window_start += 1
+            
+            # best_chunks не убывает, поэтому минимальное число блоков дают
+            # только начала из окна с тем же best_chunks, что у window_start
+            min_chunks = best_chunks[window_start]
+            best_start = window_start
+            best = best_cost[window_start] + (prefix[end] - prefix[window_start]) ** 2
+            for start in range(window_start + 1, end):
+                if best_chunks[start] != min_chunks:
+                    break
+                cost = best_cost[start] + (prefix[end] - prefix[start]) ** 2
+                if cost < best:
+                    best = cost
+                    best_start = start
+            
+            best_chunks[end] = min_chunks + 1
+            best_cost[end] = best
+            previous[end] = best_start
+        
+        boundaries = [count]
+        while boundaries[-1]:
+            boundaries.append(previous[boundaries[-1]])
+        boundaries.reverse()
+        return boundaries
     
-    def _split_long_paragraph(self, paragraph: str, paragraph_index: int) -> List[TextChunk]:
+    def _split_into_paragraphs(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Разбивает текст на параграфы
+        
+        Returns:
+            Список (начало, конец, параграф): границы очищенного параграфа в исходном
+            тексте и сам параграф с завершающим '\n\n'
+        """
+        paragraphs = []
+        piece_start = 0
+        
+        # Разбиваем по двойным переносам строк; позиции берем из совпадений,
+        # а не пересчитываем по длинам
+        for separator in _PARAGRAPH_SPLIT.finditer(text):
+            self._append_paragraph(paragraphs, text, piece_start, separator.start())
+            piece_start = separator.end()
+        self._append_paragraph(paragraphs, text, piece_start, len(text))
+        
+        return paragraphs
+    
+    @staticmethod
+    def _append_paragraph(paragraphs: List[Tuple[int, int, str]], text: str, start: int, end: int):
+        """Очищает кусок text[start:end] от лишних пробелов и добавляет его, если он не пустой"""
+        piece = text[start:end]
+        cleaned = piece.strip()
+        if cleaned:
+            start += len(piece) - len(piece.lstrip())
+            paragraphs.append((start, start + len(cleaned), cleaned + '\n\n'))
+    
+    def _split_long_paragraph(self, paragraph: str, paragraph_index: int,
+                              paragraph_start: int = 0) -> Iterator[TextChunk]:
         """Разбивает слишком длинный параграф на предложения"""
-        # Разбиваем на предложения
-        sentences = re.split(r'(?<=[.!?])\s+', paragraph)
+        # В исходном тексте параграф занимает paragraph_start + len(без '\n\n')
+        paragraph_end = len(paragraph.rstrip())
+        
+        current_parts: List[str] = []
+        current_length = 0
+        chunk_start = 0
+        chunk_end = 0
+        sentence_start = 0
         
-        chunks = []
-        current_chunk = ""
-        start_pos = 0
+        # Разбиваем на предложения, запоминая их границы внутри параграфа
+        sentence_spans = []
+        for separator in _SENTENCE_SPLIT.finditer(paragraph):
+            sentence_spans.append((sentence_start, separator.start(1)))
+            sentence_start = separator.end(1)
+        sentence_spans.append((sentence_start, len(paragraph)))
         
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= self.max_chunk_size:
-                current_chunk += sentence + " "
+        for start, end in sentence_spans:
+            sentence = paragraph[start:end]
+            if current_length + len(sentence) <= self.max_chunk_size:
+                if not current_parts:
+                    chunk_start = start
+                current_parts.append(sentence)
+                current_length += len(sentence) + 1
+                chunk_end = end
             else:
+                current_chunk = ' '.join(current_parts)
                 if current_chunk.strip():
-                    chunks.append(TextChunk(
+                    yield TextChunk(
                         text=current_chunk.strip(),
-                        start_index=start_pos,
-                        end_index=start_pos + len(current_chunk),
+                        start_index=paragraph_start + chunk_start,
+                        end_index=paragraph_start + min(chunk_end, paragraph_end),
                         paragraph_index=paragraph_index,
                         is_complete_paragraph=False
-                    ))
+                    )
                 
-                start_pos += len(current_chunk)
-                current_chunk = sentence + " "
+                current_parts = [sentence]
+                current_length = len(sentence) + 1
+                chunk_start = start
+                chunk_end = end
         
         # Добавляем последний кусок
+        current_chunk = ' '.join(current_parts)
         if current_chunk.strip():
-            chunks.append(TextChunk(
+            yield TextChunk(
                 text=current_chunk.strip(),
-                start_index=start_pos,
-                end_index=start_pos + len(current_chunk),
+                start_index=paragraph_start + chunk_start,
+                end_index=paragraph_start + min(chunk_end, paragraph_end),
                 paragraph_index=paragraph_index,
                 is_complete_paragraph=False
-            ))
-        
-        return chunks
+            )
     
-    def get_chunk_statistics(self, chunks: List[TextChunk]) -> dict:
-        """Возвращает статистику по блокам"""
-        if not chunks:
-            return {
-                'total_chunks': 0,
-                'total_characters': 0,
-                'average_chunk_size': 0,
-                'max_chunk_size': 0,
-                'min_chunk_size': 0,
-                'complete_paragraphs': 0
-            }
-        
-        sizes = [len(chunk.text) for chunk in chunks]
+    def get_chunk_statistics(self, chunks: Iterable[TextChunk]) -> dict:
+        """Возвращает статистику по блокам (за один проход, подходит и для итератора chunk_text)"""
+        total_chunks = 0
+        total_characters = 0
+        max_size = 0
+        min_size = 0
+        complete_paragraphs = 0
+        
+        for chunk in chunks:
+            size = len(chunk.text)
+            if not total_chunks or size < min_size:
+                min_size = size
+            if size > max_size:
+                max_size = size
+            total_chunks += 1
+            total_characters += size
+            if chunk.is_complete_paragraph:
+                complete_paragraphs += 1
         
         return {
-            'total_chunks': len(chunks),
-            'total_characters': sum(sizes),
-            'average_chunk_size': sum(sizes) / len(sizes),
-            'max_chunk_size': max(sizes),
-            'min_chunk_size': min(sizes),
-            'complete_paragraphs': sum(1 for chunk in chunks if chunk.is_complete_paragraph)
+            'total_chunks': total_chunks,
+            'total_characters': total_characters,
+            'average_chunk_size': total_characters / total_chunks if total_chunks else 0,
+            'max_chunk_size': max_size,
+            'min_chunk_size': min_size,
+            'complete_paragraphs': complete_paragraphs
         } 
\ No newline at end of file
@@ -2,15 +2,20 @@
 Основной модуль переводчика с OpenRouter API
 """
 
+import sys
 import time
 import json
+import gzip
 import logging
 import re
 import asyncio
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sized, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from dataclasses import dataclass
 
 import requests
+from requests.adapters import HTTPAdapter
 import aiohttp
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from tenacity import AsyncRetrying, RetryError
@@ -18,8 +23,98 @@ from tenacity import AsyncRetrying, RetryError
 from config import config
 from text_chunker import TextChunk
 
+# orjson - необязательная зависимость: в разы быстрее сериализует тела запросов и ответов API
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-@dataclass
+
+def _json_dumps(payload: Dict[str, Any]) -> bytes:
+    """Сериализует тело запроса в JSON (UTF-8)"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(data: bytes) -> Any:
+    """Разбирает JSON ответа API (ошибки - json.JSONDecodeError и его подклассы)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Уровень gzip для тел запросов (COMPRESS_REQUESTS): текст сжимается в 3-4 раза
+# уже на первом уровне, а более высокие только тратят CPU
+REQUEST_COMPRESS_LEVEL = 1
+
+
+# tiktoken - необязательная зависимость: точный подсчет токенов для max_tokens
+# вместо оценки "4 символа на токен"
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Кодировка моделей семейства GPT-4o/GPT-4.1 (модель по умолчанию - gpt-4.1-nano)
+TOKEN_ENCODING = "o200k_base"
+
+# Сколько секунд ждать загрузки словаря tiktoken, прежде чем перейти на оценку по символам
+TOKEN_ENCODING_LOAD_TIMEOUT = 10
+
+
+def _load_token_encoding():
+    """Возвращает кодировку tiktoken или None, если tiktoken не установлен или словарь недоступен"""
+    if tiktoken is None:
+        return None
+    
+    loaded = []
+    
+    def load():
+        try:
+            loaded.append(tiktoken.get_encoding(TOKEN_ENCODING))
+        except Exception:
+            pass
+    
+    # При первом использовании tiktoken скачивает словарь без таймаута: без сети или
+    # за прокси это может зависнуть, поэтому ждем загрузку в фоновом потоке ограниченное время
+    loader = threading.Thread(target=load, name="tiktoken-loader", daemon=True)
+    loader.start()
+    loader.join(TOKEN_ENCODING_LOAD_TIMEOUT)
+    return loaded[0] if loaded else None
+
+
+# Разделитель фрагментов при пакетном переводе нескольких текстов одним запросом
+BATCH_SEPARATOR = "\n<<<###>>>\n"
+
+BATCH_PROMPT_SUFFIX = f"""
+Текст состоит из нескольких независимых фрагментов, разделенных строкой {BATCH_SEPARATOR.strip()}.
+Переведите каждый фрагмент отдельно и сохраните все разделители {BATCH_SEPARATOR.strip()} на своих местах, не добавляя новых.
+"""
+
+# Бюджет символов пакетного запроса: перевод всех фрагментов должен уместиться в max_tokens,
+# иначе обрезанный ответ не делится по разделителям и фрагменты переводятся заново
+BATCH_MAX_CHARS = 30000
+
+# В пакет попадают только тексты заметно меньше бюджета, крупные уходят отдельными запросами
+BATCH_TEXT_MAX_CHARS = BATCH_MAX_CHARS // 3
+
+# Сколько секунд держать простаивающее соединение с API открытым для следующих запросов
+KEEPALIVE_TIMEOUT = 60
+
+# Сколько секунд считать успешную проверку соединения действительной
+CONNECTION_CHECK_TTL = 300
+
+# Лимит ответа для проверки соединения: достаточно, чтобы модель ответила,
+# не тратя токены на полноценный перевод (некоторые провайдеры требуют минимум 16)
+CONNECTION_CHECK_MAX_TOKENS = 16
+
+# slots=True для dataclass доступен с Python 3.10; у TranslationResult есть значения
+# по умолчанию, поэтому ручной __slots__ для старых версий невозможен
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class TranslationResult:
     """Результат перевода"""
     original_text: str
@@ -44,6 +139,36 @@ class OpenRouterTranslator:
             "X-Title": "Literary Document Translator"
         }
         
+        # Сжатие тел запросов включается явно: не каждый шлюз принимает Content-Encoding в запросе
+        self._compress_requests = config.compress_requests
+        if self._compress_requests:
+            self.headers["Content-Encoding"] = "gzip"
+        
+        # Одна сессия на переводчик: TCP/TLS соединение переиспользуется между запросами.
+        # Пул рассчитан на параллельные запросы translate_chunks (keep-alive requests
+        # включает сам), повторы выполняет tenacity, а не urllib3
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(1, config.max_concurrent_requests),
+            max_retries=0,
+            pool_block=False
+        ))
+        
+        # Промпты и лимит токенов не меняются между запросами - вычисляем один раз
+        self._system_prompt = self.get_translation_prompt()
+        self._batch_system_prompt = self._system_prompt + BATCH_PROMPT_SUFFIX
+        self._max_tokens = getattr(config, 'max_tokens', 15000)
+        
+        # Кодировка tiktoken загружается при первом подсчете токенов, а не в конструкторе
+        self._token_encoding = None
+        self._token_encoding_loaded = False
+        self._token_encoding_lock = threading.Lock()
+        
+        # Время (time.monotonic) последней успешной проверки соединения
+        self._last_connection_ok: Optional[float] = None
+        
         # Настраиваем логирование
         self.logger = logging.getLogger(__name__)
         
@@ -68,6 +193,23 @@ class OpenRouterTranslator:
 Переведите следующий текст, строго придерживаясь этих принципов:
 """
     
+    def _encode_payload(self, payload: Dict[str, Any]) -> bytes:
+        """Сериализует тело запроса и, если включено COMPRESS_REQUESTS, сжимает его gzip"""
+        data = _json_dumps(payload)
+        if self._compress_requests:
+            return gzip.compress(data, compresslevel=REQUEST_COMPRESS_LEVEL)
+        return data
+    
+    def _get_token_encoding(self):
+        """Возвращает кодировку tiktoken, загружая ее один раз (None - оценка по символам)"""
+        if not self._token_encoding_loaded:
+            # translate_chunks считает токены из нескольких потоков
+            with self._token_encoding_lock:
+                if not self._token_encoding_loaded:
+                    self._token_encoding = _load_token_encoding()
+                    self._token_encoding_loaded = True
+        return self._token_encoding
+    
     def _calculate_optimal_max_tokens(self, text: str) -> int:
         """
         Вычисляет оптимальное количество токенов для перевода на основе размера входного текста
@@ -78,13 +220,18 @@ class OpenRouterTranslator:
         Returns:
             Оптимальное количество max_tokens
         """
-        # Приблизительная оценка: 1 токен ≈ 4 символа для английского
+        # С tiktoken считаем токены входного текста точно, иначе приблизительно:
+        # 1 токен ≈ 4 символа для английского.
         # Для русского обычно нужно больше токенов (коэффициент 1.2-1.5)
-        input_tokens_estimate = len(text) // 4
+        token_encoding = self._get_token_encoding()
+        if token_encoding is not None:
+            input_tokens_estimate = len(token_encoding.encode(text, disallowed_special=()))
+        else:
+            input_tokens_estimate = len(text) // 4
         output_tokens_estimate = int(input_tokens_estimate * 1.3)  # Коэффициент для русского
         
         # Используем настройку из конфигурации как максимум
-        max_allowed = getattr(config, 'max_tokens', 15000)
+        max_allowed = self._max_tokens
         
         # Минимум 2000 токенов для коротких текстов
         min_tokens = 2000
@@ -92,7 +239,8 @@ class OpenRouterTranslator:
         # Оптимальное значение с ограничениями
         optimal_tokens = max(min_tokens, min(output_tokens_estimate, max_allowed))
         
-        self.logger.debug(f"Текст: {len(text)} символов, расчетные токены вывода: {output_tokens_estimate}, используем: {optimal_tokens}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Текст: {len(text)} символов, расчетные токены вывода: {output_tokens_estimate}, используем: {optimal_tokens}")
         
         return optimal_tokens
     
@@ -112,16 +260,20 @@ class OpenRouterTranslator:
         wait=wait_exponential(multiplier=1, min=1, max=10),
         retry=retry_if_exception_type((requests.exceptions.RequestException, requests.exceptions.Timeout))
     )
-    def translate_text(self, text: str) -> TranslationResult:
+    def translate_text(self, text: str, system_prompt: Optional[str] = None) -> TranslationResult:
         """
         Переводит текст с английского на русский
         
         Args:
             text: Текст для перевода
+            system_prompt: Системный промпт (по умолчанию - промпт перевода)
             
         Returns:
             Результат перевода
         """
+        if system_prompt is None:
+            system_prompt = self._system_prompt
+        
         start_time = time.time()
         
         try:
@@ -131,7 +283,7 @@ class OpenRouterTranslator:
                 "messages": [
                     {
                         "role": "system",
-                        "content": self.get_translation_prompt()
+                        "content": system_prompt
                     },
                     {
                         "role": "user",
@@ -146,11 +298,9 @@ class OpenRouterTranslator:
             }
             
             # Отправляем запрос
-            session = requests.Session()
-            session.headers.update(self.headers)
-            response = session.post(
+            response = self.session.post(
                 self.base_url,
-                json=payload,
+                data=self._encode_payload(payload),
                 timeout=config.request_timeout
             )
             
@@ -158,7 +308,7 @@ class OpenRouterTranslator:
             response.raise_for_status()
             
             # Парсим ответ
-            response_data = response.json()
+            response_data = _json_loads(response.content)
             
             if 'choices' not in response_data or not response_data['choices']:
                 raise ValueError("Некорректный ответ от API - нет choices")
@@ -173,7 +323,8 @@ class OpenRouterTranslator:
             
             processing_time = time.time() - start_time
             
-            self.logger.info(f"Перевод выполнен за {processing_time:.2f}с, токенов: {tokens_used}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(f"Перевод выполнен за {processing_time:.2f}с, токенов: {tokens_used}")
             
             return TranslationResult(
                 original_text=text,
@@ -216,8 +367,12 @@ class OpenRouterTranslator:
                 processing_time=time.time() - start_time
             )
     
-    async def translate_text_async(self, session: aiohttp.ClientSession, text: str, semaphore: asyncio.Semaphore) -> TranslationResult:
+    async def translate_text_async(self, session: aiohttp.ClientSession, text: str, semaphore: asyncio.Semaphore,
+                                   system_prompt: Optional[str] = None) -> TranslationResult:
         """Асинхронная версия перевода текста"""
+        if system_prompt is None:
+            system_prompt = self._system_prompt
+        
         async with semaphore:
             start_time = time.time()
             retryer = AsyncRetrying(
@@ -231,15 +386,15 @@ class OpenRouterTranslator:
                         payload = {
                             "model": self.model,
                             "messages": [
-                                {"role": "system", "content": self.get_translation_prompt()},
+                                {"role": "system", "content": system_prompt},
                                 {"role": "user", "content": text}
                             ],
                             "max_tokens": self._calculate_optimal_max_tokens(text), 
                             "temperature": 0.3
                         }
-                        async with session.post(self.base_url, json=payload, timeout=config.request_timeout) as response:
+                        async with session.post(self.base_url, data=self._encode_payload(payload), timeout=config.request_timeout) as response:
                             response.raise_for_status()
-                            response_data = await response.json()
+                            response_data = _json_loads(await response.read())
                             if not response_data.get('choices'):
                                 raise ValueError("Некорректный ответ от API")
                             
@@ -262,67 +417,303 @@ class OpenRouterTranslator:
                     processing_time=time.time() - start_time
                 )
 
+    def _build_batches(self, texts: List[str]) -> List[List[int]]:
+        """Группирует индексы соседних непустых текстов в пакеты (те же лимиты, что в _iter_batches)"""
+        return [[index for index, _ in batch] for batch in self._iter_batches(enumerate(texts))]
+    
+    def _iter_batches(self, items: Iterable[Tuple[int, str]]) -> Iterator[List[Tuple[int, str]]]:
+        """
+        Лениво группирует пары (индекс, текст) соседних непустых текстов в пакеты
+        
+        Пакет ограничен config.batch_size текстами и BATCH_MAX_CHARS символами;
+        текст длиннее BATCH_TEXT_MAX_CHARS уходит отдельным запросом.
+        """
+        current: List[Tuple[int, str]] = []
+        current_chars = 0
+        max_texts = max(1, config.batch_size)
+        
+        for index, text in items:
+            if not text.strip():
+                continue
+            
+            if len(text) > BATCH_TEXT_MAX_CHARS:
+                if current:
+                    yield current
+                    current = []
+                    current_chars = 0
+                yield [(index, text)]
+                continue
+            
+            if current and (len(current) >= max_texts or current_chars + len(text) > BATCH_MAX_CHARS):
+                yield current
+                current = []
+                current_chars = 0
+            
+            current.append((index, text))
+            current_chars += len(text)
+        
+        if current:
+            yield current
+    
+    @staticmethod
+    def _failed_batch_results(texts: List[str], batch_result: TranslationResult) -> List[TranslationResult]:
+        """Переносит ошибку пакетного запроса на каждый текст пакета"""
+        return [
+            TranslationResult(
+                original_text=text,
+                translated_text="",
+                success=False,
+                error=batch_result.error,
+                processing_time=batch_result.processing_time
+            )
+            for text in texts
+        ]
+    
+    def _split_batch_result(self, texts: List[str], batch_result: TranslationResult) -> Optional[List[TranslationResult]]:
+        """Делит ответ на пакетный запрос по BATCH_SEPARATOR; None, если число фрагментов не совпало"""
+        if not batch_result.success:
+            return None
+        
+        parts = batch_result.translated_text.split(BATCH_SEPARATOR.strip())
+        if len(parts) != len(texts):
+            self.logger.warning(f"Пакетный перевод вернул {len(parts)} фрагментов вместо {len(texts)}, переводим по отдельности")
+            return None
+        
+        return [
+            TranslationResult(
+                original_text=text,
+                translated_text=part.strip(),
+                success=True,
+                tokens_used=batch_result.tokens_used if i == 0 else None,
+                processing_time=batch_result.processing_time
+            )
+            for i, (text, part) in enumerate(zip(texts, parts))
+        ]
+    
+    def translate_batch(self, texts: List[str]) -> List[TranslationResult]:
+        """
+        Синхронно переводит несколько текстов одним запросом, разделяя их BATCH_SEPARATOR
+        
+        Если ответ не удалось разделить на нужное число фрагментов,
+        тексты переводятся по отдельности. Ошибка самого запроса (сеть, HTTP)
+        возвращается для каждого текста без повторных запросов.
+        """
+        if len(texts) == 1:
+            return [self.translate_text(texts[0])]
+        
+        batch_result = self.translate_text(
+            BATCH_SEPARATOR.join(texts),
+            system_prompt=self._batch_system_prompt
+        )
+        if not batch_result.success:
+            return self._failed_batch_results(texts, batch_result)
+        
+        results = self._split_batch_result(texts, batch_result)
+        if results is None:
+            results = [self.translate_text(text) for text in texts]
+        return results
+    
+    async def translate_batch_async(self, session: aiohttp.ClientSession, texts: List[str],
+                                    semaphore: asyncio.Semaphore) -> List[TranslationResult]:
+        """
+        Переводит несколько текстов одним запросом, разделяя их BATCH_SEPARATOR
+        
+        Если ответ не удалось разделить на нужное число фрагментов,
+        тексты переводятся по отдельности. Ошибка самого запроса (сеть, HTTP)
+        возвращается для каждого текста без повторных запросов.
+        """
+        if len(texts) == 1:
+            return [await self.translate_text_async(session, texts[0], semaphore)]
+        
+        batch_result = await self.translate_text_async(
+            session, BATCH_SEPARATOR.join(texts), semaphore,
+            system_prompt=self._batch_system_prompt
+        )
+        if not batch_result.success:
+            return self._failed_batch_results(texts, batch_result)
+        
+        results = self._split_batch_result(texts, batch_result)
+        if results is not None:
+            return results
+        
+        return list(await asyncio.gather(*(
+            self.translate_text_async(session, text, semaphore) for text in texts
+        )))
+    
     async def translate_texts_in_parallel(self, texts: List[str], progress_callback=None) -> List[TranslationResult]:
-        """Параллельный перевод списка текстов"""
+        """
+        Параллельный перевод списка текстов
+        
+        Короткие соседние тексты объединяются в пакеты (один HTTP запрос на пакет),
+        результаты возвращаются в порядке исходных текстов.
+        """
+        results_queue: asyncio.Queue = asyncio.Queue()
+        await self.translate_texts_streaming(texts, results_queue, progress_callback)
+        
+        results: List[Optional[TranslationResult]] = [None] * len(texts)
+        while not results_queue.empty():
+            index, result = results_queue.get_nowait()
+            results[index] = result
+        return results
+    
+    async def translate_texts_streaming(self, texts: List[str], results_queue: asyncio.Queue,
+                                        progress_callback=None) -> None:
+        """
+        Параллельный перевод списка текстов с выдачей результатов по мере готовности
+        
+        В очередь кладутся пары (индекс текста, TranslationResult) в порядке завершения
+        запросов, поэтому потребитель может обрабатывать переводы, не дожидаясь остальных.
+        Для ограниченной очереди put() ждет, пока потребитель освободит место.
+        """
         semaphore = asyncio.Semaphore(config.max_concurrent_requests)
-        async with aiohttp.ClientSession(headers=self.headers) as session:
-            tasks = [
-                asyncio.ensure_future(
-                    self.translate_text_async(session, text, semaphore) if text.strip() 
-                    else asyncio.sleep(0, result=TranslationResult(original_text=text, translated_text="", success=True))
-                ) for text in texts
-            ]
+        completed = 0
+        
+        # Пустые тексты не отправляются в API
+        for index, text in enumerate(texts):
+            if not text.strip():
+                completed += 1
+                await results_queue.put((index, TranslationResult(original_text=text, translated_text="", success=True)))
+        
+        # Пул соединений по числу одновременных запросов: keep-alive соединения
+        # переиспользуются следующими пакетами без повторного TLS рукопожатия
+        connector = aiohttp.TCPConnector(
+            limit=config.max_concurrent_requests,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=KEEPALIVE_TIMEOUT
+        )
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector) as session:
+            async def run_batch(batch: List[int]):
+                return batch, await self.translate_batch_async(session, [texts[i] for i in batch], semaphore)
             
-            results = []
-            for i, task in enumerate(asyncio.as_completed(tasks)):
-                result = await task
-                results.append(result)
-                if progress_callback:
-                    progress_callback(len(results), len(texts), result.success)
-            return results
+            tasks = [asyncio.ensure_future(run_batch(batch)) for batch in self._build_batches(texts)]
+            
+            try:
+                for task in asyncio.as_completed(tasks):
+                    batch, batch_results = await task
+                    for index, result in zip(batch, batch_results):
+                        completed += 1
+                        if progress_callback:
+                            progress_callback(completed, len(texts), result.success)
+                        await results_queue.put((index, result))
+            finally:
+                # При отмене потребителем не оставляем висящих запросов
+                for task in tasks:
+                    task.cancel()
+    
+    async def translate_chunks_async(self, chunks: Iterable[TextChunk], progress_callback=None) -> List[TranslationResult]:
+        """
+        Асинхронно переводит блоки текста через aiohttp
+        
+        Все запросы идут из одного цикла событий через общий пул keep-alive соединений
+        (см. translate_texts_streaming), без потока на каждый запрос.
+        
+        Args:
+            chunks: Блоки для перевода
+            progress_callback: Функция для отслеживания прогресса
+            
+        Returns:
+            Список результатов перевода в порядке блоков
+        """
+        return await self.translate_texts_in_parallel([chunk.text for chunk in chunks], progress_callback)
     
-    def translate_chunks(self, chunks: List[TextChunk], progress_callback=None) -> List[TranslationResult]:
+    def translate_chunks(self, chunks: Iterable[TextChunk], progress_callback=None,
+                         total: Optional[int] = None) -> List[TranslationResult]:
         """
-        Переводит список блоков текста (оптимизировано для больших блоков)
+        Переводит блоки текста (оптимизировано для больших блоков)
         
         Args:
-            chunks: Список блоков для перевода
+            chunks: Блоки для перевода - список или итератор (например, TextChunker.chunk_text),
+                который читается по одному блоку
             progress_callback: Функция для отслеживания прогресса
+            total: Число блоков, если chunks - итератор (для прогресса)
             
         Returns:
             Список результатов перевода
         """
-        results = []
-        total_chars = sum(len(chunk.text) for chunk in chunks)
+        if total is None and isinstance(chunks, Sized):
+            total = len(chunks)
+        total_label = total if total is not None else "?"
+        
+        results_by_index: Dict[int, TranslationResult] = {}
+        chunk_count = 0
         processed_chars = 0
+        completed = 0
+        successful = 0
+        total_tokens = 0
         
-        self.logger.info(f"🚀 Начинаем последовательный перевод {len(chunks)} блоков ({total_chars:,} символов)")
+        # Запросы к API ждут сеть, а не CPU: держим в работе до max_concurrent_requests
+        # запросов, а итератор блоков читаем не дальше, чем на окно пакетов вперед
+        max_in_flight = config.max_concurrent_requests * 2
+        pending: Dict[Future, List[Tuple[int, str]]] = {}
         
-        for i, chunk in enumerate(chunks):
-            chunk_size = len(chunk.text)
-            self.logger.info(f"Переводим блок {i+1}/{len(chunks)} ({chunk_size:,} символов)")
-            
-            # Переводим блок
-            result = self.translate_text(chunk.text)
-            results.append(result)
-            
-            # Обновляем прогресс
-            processed_chars += chunk_size
-            if progress_callback:
-                progress_callback(i + 1, len(chunks), result.success)
+        def collect(future: Future):
+            nonlocal processed_chars, completed, successful, total_tokens
+            batch = pending.pop(future)
+            for (i, text), result in zip(batch, future.result()):
+                chunk_size = len(text)
+                results_by_index[i] = result
+                
+                # Обновляем прогресс
+                completed += 1
+                processed_chars += chunk_size
+                if progress_callback:
+                    progress_callback(completed, total if total is not None else completed, result.success)
+                
+                # Итоговая статистика копится здесь же, без повторного прохода по результатам
+                if result.tokens_used:
+                    total_tokens += result.tokens_used
+                
+                # Логируем промежуточную статистику
+                if result.success:
+                    successful += 1
+                    if log_chunks:
+                        tokens_used = result.tokens_used or 0
+                        efficiency = tokens_used / chunk_size if chunk_size > 0 else 0
+                        self.logger.info(f"✅ Блок {i+1} переведен: {tokens_used} токенов, эффективность: {efficiency:.3f} токен/символ")
+                else:
+                    self.logger.warning(f"❌ Ошибка блока {i+1}: {result.error}")
+        
+        def numbered_texts() -> Iterator[Tuple[int, str]]:
+            """Нумерует блоки; пустые не отправляются в API, но получают свой результат"""
+            nonlocal chunk_count, completed, successful
+            for i, chunk in enumerate(chunks):
+                chunk_count = i + 1
+                if not chunk.text.strip():
+                    results_by_index[i] = TranslationResult(original_text=chunk.text, translated_text="", success=True)
+                    completed += 1
+                    successful += 1
+                    if progress_callback:
+                        progress_callback(completed, total if total is not None else completed, True)
+                    continue
+                yield i, chunk.text
+        
+        # Строки о каждом блоке форматируются, только если INFO действительно пишется
+        log_chunks = self.logger.isEnabledFor(logging.INFO)
+        
+        self.logger.info(f"🚀 Начинаем параллельный перевод {total_label} блоков "
+                         f"(до {config.max_concurrent_requests} запросов одновременно)")
+        
+        with ThreadPoolExecutor(max_workers=config.max_concurrent_requests) as executor:
+            # Небольшие соседние блоки отправляются одним запросом (см. _iter_batches)
+            for batch in self._iter_batches(numbered_texts()):
+                if log_chunks:
+                    for i, text in batch:
+                        self.logger.info(f"Переводим блок {i+1}/{total_label} ({len(text):,} символов)")
+                pending[executor.submit(self.translate_batch, [text for _, text in batch])] = batch
+                
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
             
-            # Логируем промежуточную статистику
-            if result.success:
-                tokens_used = result.tokens_used or 0
-                efficiency = tokens_used / chunk_size if chunk_size > 0 else 0
-                self.logger.info(f"✅ Блок {i+1} переведен: {tokens_used} токенов, эффективность: {efficiency:.3f} токен/символ")
-            else:
-                self.logger.warning(f"❌ Ошибка блока {i+1}: {result.error}")
+            for future in as_completed(list(pending)):
+                collect(future)
+        
+        # Результаты в порядке исходных блоков
+        results = [results_by_index[i] for i in range(chunk_count)]
         
         # Финальная статистика
-        successful = len([r for r in results if r.success])
-        total_tokens = sum(r.tokens_used for r in results if r.tokens_used)
-        self.logger.info(f"🎉 Перевод завершен: {successful}/{len(chunks)} блоков, {total_tokens:,} токенов")
+        self.logger.info(f"🎉 Перевод завершен: {successful}/{len(results)} блоков ({processed_chars:,} символов), {total_tokens:,} токенов")
         
         return results
     
@@ -331,31 +722,60 @@ class OpenRouterTranslator:
         if not results:
             return {}
         
-        successful = [r for r in results if r.success]
-        failed = [r for r in results if not r.success]
+        # Один проход по результатам вместо отдельных списков и сумм
+        successful = 0
+        total_tokens = 0
+        total_time = 0
+        errors = []
         
-        total_tokens = sum(r.tokens_used for r in successful if r.tokens_used)
-        total_time = sum(r.processing_time for r in results if r.processing_time)
+        for r in results:
+            if r.success:
+                successful += 1
+                if r.tokens_used:
+                    total_tokens += r.tokens_used
+            elif r.error:
+                errors.append(r.error)
+            if r.processing_time:
+                total_time += r.processing_time
         
         return {
             'total_chunks': len(results),
-            'successful_chunks': len(successful),
-            'failed_chunks': len(failed),
-            'success_rate': len(successful) / len(results) if results else 0,
+            'successful_chunks': successful,
+            'failed_chunks': len(results) - successful,
+            'success_rate': successful / len(results),
             'total_tokens_used': total_tokens,
             'total_processing_time': total_time,
-            'average_chunk_time': total_time / len(results) if results else 0,
-            'errors': [r.error for r in failed if r.error]
+            'average_chunk_time': total_time / len(results),
+            'errors': errors
         }
     
     def test_connection(self) -> bool:
-        """Тестирует соединение с API"""
+        """
+        Тестирует соединение с API
+        
+        Вместо перевода тестовой фразы отправляется запрос с минимальным max_tokens;
+        успешный результат кэшируется на CONNECTION_CHECK_TTL секунд.
+        """
+        if (self._last_connection_ok is not None
+                and time.monotonic() - self._last_connection_ok < CONNECTION_CHECK_TTL):
+            return True
+        
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": "Hello, world!"}],
+            "max_tokens": CONNECTION_CHECK_MAX_TOKENS
+        }
         try:
-            test_result = self.translate_text("Hello, world!")
-            return test_result.success
+            response = self.session.post(self.base_url, data=self._encode_payload(payload), timeout=config.request_timeout)
+            response.raise_for_status()
+            if not _json_loads(response.content).get('choices'):
+                raise ValueError("Некорректный ответ от API - нет choices")
         except Exception as e:
             self.logger.error(f"Ошибка тестирования соединения: {e}")
             return False
+        
+        self._last_connection_ok = time.monotonic()
+        return True
 
 
 class DocumentTranslator:
@@ -365,18 +785,22 @@ class DocumentTranslator:
         self.api_translator = OpenRouterTranslator()
         self.logger = logging.getLogger(__name__)
     
-    def translate_document_chunks(self, chunks: List[TextChunk], progress_callback=None) -> List[TranslationResult]:
+    def translate_document_chunks(self, chunks: Iterable[TextChunk], progress_callback=None,
+                                  total: Optional[int] = None) -> List[TranslationResult]:
         """
         Переводит блоки документа
         
         Args:
-            chunks: Список блоков текста
+            chunks: Блоки текста - список или итератор
             progress_callback: Функция для отслеживания прогресса
+            total: Число блоков, если chunks - итератор
             
         Returns:
             Список результатов перевода
         """
-        self.logger.info(f"Начинаем перевод {len(chunks)} блоков")
+        if total is None and isinstance(chunks, Sized):
+            total = len(chunks)
+        self.logger.info(f"Начинаем перевод {total if total is not None else '?'} блоков")
         
         # Проверяем соединение с API
         if not self.api_translator.test_connection():
@@ -384,10 +808,27 @@ class DocumentTranslator:
             return []
         
         # Переводим блоки
-        results = self.api_translator.translate_chunks(chunks, progress_callback)
+        results = self.api_translator.translate_chunks(chunks, progress_callback, total)
         
         # Выводим статистику
         stats = self.api_translator.get_translation_statistics(results)
         self.logger.info(f"Перевод завершен. Успешно: {stats['successful_chunks']}/{stats['total_chunks']}")
         
-        return results 
\ No newline at end of file
+        return results
+
+
+# Общий экземпляр переводчика (создается при первом обращении)
+_translator: Optional[DocumentTranslator] = None
+
+
+def get_translator() -> DocumentTranslator:
+    """
+    Возвращает общий DocumentTranslator процесса
+    
+    Проверка API и перевод документа используют одну HTTP сессию с уже
+    открытыми соединениями вместо создания нового переводчика на каждый вызов.
+    """
+    global _translator
+    if _translator is None:
+        _translator = DocumentTranslator()
+    return _translator